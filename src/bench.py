@@ -0,0 +1,276 @@
+#!/usr/bin/env python
+# bench.py Render path benchmarks, one JSON object per line on stdout
+
+# Runs on the device (mpremote run bench.py) and on the host, where the
+# simulator provides the MicroPython modules. Allocations are gc.mem_alloc
+# deltas with the collector disabled on MicroPython, on CPython they are
+# the tracemalloc peak above baseline within a frame.
+#
+#   python bench.py [frames] > new.jsonl
+#   python bench.py --compare old.jsonl new.jsonl
+#   python bench.py --gait [imu.csv]
+#
+# --gait runs the step detector over an IMU trace (host only), the
+# synthetic one from the simulator by default or a recorded CSV, in FIFO
+# sized batches, and adds one row per trace segment with the cadence found.
+
+import gc
+import sys
+
+CPYTHON = sys.implementation.name == 'cpython'
+if CPYTHON:
+    import sim
+    sim.install()
+
+import json
+import time
+
+import fancyled as fancy
+import fancyfixed
+import pixelops
+from compositor import Compositor, PaletteLayer, SparkleLayer, AlertLayer
+from frame import FrameBuffer
+from palette import CompiledPalette, PHASE_ONE
+from palettes import mixer_palette
+from gait import GaitDetector, NAMES as GAIT_NAMES
+
+if CPYTHON:
+    import tracemalloc
+
+    def ticks_us():
+        return time.perf_counter_ns() // 1000
+
+    def ticks_diff(a, b):
+        return a - b
+else:
+    ticks_us = time.ticks_us
+    ticks_diff = time.ticks_diff
+
+SIZES = (44, 144, 300)
+FRAMES = 50
+
+
+class _Strip:
+    # NeoPixel look-alike without a pin, bpp=3
+    ORDER = (1, 0, 2, 3)
+
+    def __init__(self, n):
+        self.n = n
+        self.bpp = 3
+        self.buf = bytearray(n * 3)
+
+    def __setitem__(self, i, v):
+        j = i * 3
+        self.buf[j + 1] = v[0]
+        self.buf[j] = v[1]
+        self.buf[j + 2] = v[2]
+
+    def write(self):
+        pass
+
+
+def _alloc_start():
+    gc.collect()
+    if CPYTHON:
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        return tracemalloc.get_traced_memory()[0]
+    gc.disable()
+    return gc.mem_alloc()
+
+
+def _alloc_end(start, frames):
+    if CPYTHON:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak - start
+    used = gc.mem_alloc() - start
+    gc.enable()
+    return used // frames
+
+
+def run(name, step, frames, **info):
+    # step(i) renders frame i
+    step(0)  # warm up, first call may compile or fill caches
+    if CPYTHON:
+        # peak of a single frame
+        alloc_ref = _alloc_start()
+        step(1)
+        alloc = _alloc_end(alloc_ref, 1)
+        t0 = ticks_us()
+        for i in range(frames):
+            step(i)
+        elapsed = ticks_diff(ticks_us(), t0)
+    else:
+        alloc_ref = _alloc_start()
+        t0 = ticks_us()
+        for i in range(frames):
+            step(i)
+        elapsed = ticks_diff(ticks_us(), t0)
+        alloc = _alloc_end(alloc_ref, frames)
+    us = elapsed / frames
+    result = {
+        'bench': name,
+        'frames': frames,
+        'us_per_frame': round(us, 1),
+        'fps': round(1000000 / us, 1) if us else None,
+        'alloc_per_frame': alloc,
+        'alloc_method': 'tracemalloc-peak' if CPYTHON else 'gc.mem_alloc',
+        'impl': sys.implementation.name,
+        'accelerated': pixelops.ACCELERATED,
+    }
+    result.update(info)
+    print(json.dumps(result))
+    return result
+
+
+def bench_palette(idx, n, frames):
+    palette = mixer_palette[idx]
+    strip = _Strip(n)
+    bright = 0.6
+    step = PHASE_ONE // n
+
+    def legacy(i):
+        # task_led_strip before the precompiled tables
+        offset = i / 97
+        for led in range(n):
+            color = fancy.palette_lookup(palette, offset + led / n)
+            color = fancy.gamma_adjust(color, brightness=bright)
+            packed = color.pack()
+            strip[led] = ((packed & 0xff0000) >> 16, (packed & 0xff00) >> 8, packed & 0xff)
+
+    def palette_lookup(i):
+        offset = i / 97
+        for led in range(n):
+            fancy.palette_lookup(palette, offset + led / n)
+
+    colors = [fancy.palette_lookup(palette, led / n) for led in range(n)]
+
+    def gamma_adjust(i):
+        for color in colors:
+            fancy.gamma_adjust(color, brightness=bright)
+
+    def pack(i):
+        for color in colors:
+            color.pack()
+
+    packed_palette = fancyfixed.from_crgb(palette)
+    bright_fixed = int(bright * fancyfixed.ONE)
+
+    def fixed(i):
+        offset = i * 677
+        for led in range(n):
+            fancyfixed.gamma_adjust(
+                fancyfixed.palette_lookup(packed_palette, offset + led * step), brightness=bright_fixed)
+
+    lut = CompiledPalette()
+    lut.compile(palette, bright)
+
+    def compiled(i):
+        lut.render(strip.buf, i * 677, step, n)
+
+    def compile_table(i):
+        lut.palette = None
+        lut.compile(palette, bright)
+
+    out = FrameBuffer(strip)
+    compositor = Compositor(out)
+    base = compositor.add(PaletteLayer(lut, step))
+    compositor.add(SparkleLayer(out.color(210, 210, 210), out.color(0, 0, 0), interval_ms=0))
+    alert = compositor.add(AlertLayer((0,), period_ms=1, on_ms=1))
+    alert.color = out.color(40, 12, 0)
+
+    def compose(i):
+        base.phase = i * 677
+        compositor.compose(i)
+
+    for name, fn in (('legacy_render', legacy), ('fancy.palette_lookup', palette_lookup),
+                     ('fancy.gamma_adjust', gamma_adjust), ('CRGB.pack', pack),
+                     ('fancyfixed_render', fixed), ('compiled_render', compiled),
+                     ('compose', compose)):
+        run(name, fn, frames, palette=idx, leds=n)
+    run('compile', compile_table, max(1, frames // 10), palette=idx, leds=n)
+
+
+def bench_gait(path=None, batch=8, odr=50):
+    from array import array
+    from sim.traces import SyntheticImu, CsvImu
+    if path:
+        imu = CsvImu(path)
+        duration = imu.period / 1000
+    else:
+        imu = SyntheticImu()
+        duration = imu.period
+    # whole trace as FIFO frames up front, the bench only times the detector
+    n = int(duration * odr) // batch * batch
+    samples = array('h', bytes(n * 12))
+    for i in range(n):
+        ax, ay, az, gx, gy, gz = imu.sample(i / odr)
+        samples[i * 6:i * 6 + 6] = array('h', (gx, gy, gz, ax, ay, az))
+    views = [memoryview(samples)[i * 6:(i + batch) * 6] for i in range(0, n, batch)]
+
+    gait = GaitDetector(odr)
+    run('gait', lambda i: gait.update_block(views[i % len(views)], batch),
+        len(views), batch=batch, trace=path or 'synthetic')
+
+    # accuracy, cadence per segment of the synthetic trace or per 10 s
+    gait = GaitDetector(odr)
+    spans = [(a[0], int(a[1] * 60)) for a in imu.activity] if not path else [(10, None)] * int(duration // 10)
+    at = 0
+    for seconds, expected in spans:
+        cadences = []
+        steps = gait.steps
+        end = min(n, int((at + seconds) * odr) // batch * batch)
+        for i in range(int(at * odr) // batch * batch, end, batch):
+            gait.update_block(views[i // batch], batch)
+            if i >= (at + seconds / 2) * odr:
+                # settled, second half of the span
+                cadences.append(gait.cadence)
+        cadence = sum(cadences) // len(cadences) if cadences else 0
+        print(json.dumps({
+            'bench': 'gait_span', 'trace': path or 'synthetic', 'start_s': at, 'seconds': seconds,
+            'steps': gait.steps - steps, 'cadence': cadence, 'expected_cadence': expected,
+            'gait': GAIT_NAMES[gait.gait],
+        }))
+        at += seconds
+
+
+def compare(old_path, new_path):
+    # prints the change in us_per_frame and alloc_per_frame per benchmark
+    def load(path):
+        rows = {}
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    r = json.loads(line)
+                    rows[(r['bench'], r.get('palette'), r.get('leds'))] = r
+        return rows
+    old = load(old_path)
+    new = load(new_path)
+    for key in sorted(new, key=str):
+        if key not in old:
+            continue
+        a, b = old[key], new[key]
+        change = (b['us_per_frame'] - a['us_per_frame']) / a['us_per_frame'] * 100 if a['us_per_frame'] else 0
+        print(json.dumps({
+            'bench': key[0], 'palette': key[1], 'leds': key[2],
+            'us_per_frame': [a['us_per_frame'], b['us_per_frame']],
+            'change_pct': round(change, 1),
+            'alloc_per_frame': [a['alloc_per_frame'], b['alloc_per_frame']],
+        }))
+
+
+def main(argv):
+    if len(argv) > 1 and argv[1] == '--compare':
+        compare(argv[2], argv[3])
+        return
+    if len(argv) > 1 and argv[1] == '--gait':
+        bench_gait(argv[2] if len(argv) > 2 else None)
+        return
+    frames = int(argv[1]) if len(argv) > 1 else FRAMES
+    for n in SIZES:
+        for idx in range(len(mixer_palette)):
+            bench_palette(idx, n, frames)
+
+
+main(sys.argv)
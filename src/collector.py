@@ -1,68 +1,271 @@
 #!/usr/bin/env python
+# collector.py Receive collar telemetry, show it live and record it
 
+# An asyncio DatagramProtocol only queues datagrams as they arrive. Every
+# DECODE_MS the queue is decoded in one go (lib/protocol.py, v6 and v7),
+# appended to the recording and summed up per collar. The dashboard is
+# drawn REFRESH_HZ times a second however fast datagrams come in. Log
+# lines the collar sends with its radio bursts (v8) are printed above it.
+#
+# Recordings are a directory per collar and start in the columnar format
+# of recording.py, whose load() reads them back.
+#
+#   python collector.py [--group 224.23.23.1] [--port 2323] [--out recordings] [--no-record]
+
+import argparse
+import asyncio
+import collections
+import json
+import os
 import socket
 import struct
+import sys
 import time
+from array import array
 
 from rich.console import Console
 from rich.live import Live
 from rich.table import Table
 
-def generate_table(buf) -> Table:
-    table = Table(title="DogSpeed Instrumentation")
-
-    table.add_column("Accel X", style="yellow", width=10)
-    table.add_column("Accel Y", style="yellow", width=10)
-    table.add_column("Accel Z", style="yellow", width=10)
-    table.add_column("Gyro X", style="cyan", width=10)
-    table.add_column("Gyro Y", style="cyan", width=10)
-    table.add_column("Gyro Z", style="cyan", width=10)
-    table.add_column("Pitch", style="green", width=10, justify="right")
-    table.add_column("Roll", style="blue", width=10, justify="right")
-
-    table.add_row(f"{buf[7]}", f"{buf[8]}", f"{buf[9]}", f"{buf[10]}", f"{buf[11]}", f"{buf[12]}", f"{buf[13]}", f"{buf[14]}")
-    return table
-
-MCAST_GRP = '224.23.23.1'
-MCAST_PORT = 2323
-
-sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
-sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-sock.bind((MCAST_GRP, MCAST_PORT))
-
-mreq = struct.pack('4sl', socket.inet_aton(MCAST_GRP), socket.INADDR_ANY)
-sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
-
-# # "header"
-# buf = ustruct.pack("12sHI", MACHINE_UID, VERSION, utime.ticks_us())
-# # "machine"
-# buf += ustruct.pack(
-#     "4f",
-#     axp.read(axp192.BATTERY_VOLTAGE),
-#     axp.read(axp192.DISCHARGE_CURRENT),
-#     axp.read(axp192.CHARGE_CURRENT),
-#     axp.read(axp192.TEMP),
-# )
-# # "payload"
-# buf += ustruct.pack(
-#     "8f",
-#     imu.acceleration[0],
-#     imu.acceleration[1],
-#     imu.acceleration[2],
-#     imu.gyro[0],
-#     imu.gyro[1],
-#     imu.gyro[2],
-#     fuse.pitch,
-#     fuse.roll,
-# )
-
-console = Console()
-
-while True:
-    r = sock.recv(10240)
-    buf = struct.unpack('12sHI4f8f', r)
-    #print(buf[8])
-
-    with Live(generate_table(buf), refresh_per_second=10) as live:
-        console.clear()
-        live.update(generate_table(buf))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lib'))
+import protocol
+from recording import Recorder
+
+STREAM_JSON = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stream.json')
+DECODE_MS = 50
+REFRESH_HZ = 4
+QUEUE = 10000  # datagrams waiting for decode, the oldest go first
+LEVELS = {10: 'DEBUG', 20: 'INFO', 30: 'WARNING', 40: 'ERROR', 50: 'CRITICAL'}  # as lib/log.py
+
+# (name, typecode) in every recording, then the schema's status and
+# sample fields as 'f'
+TIME_COLUMNS = (('t_us', 'q'), ('recv', 'd'))
+
+
+def columns(schema=protocol.SCHEMA_IMU):
+    status, sample = protocol.SCHEMAS[schema]
+    return TIME_COLUMNS + tuple((name, 'f') for name, _ in status + sample)
+
+
+class Collar:
+    # running totals and the recording of one collar
+    def __init__(self, uid, out):
+        self.uid = uid
+        self.out = out
+        self.version = None
+        self.datagrams = 0
+        self.samples = 0
+        self.lost = 0
+        self.status = {}
+        self.latest = {}
+        self.rate = 0.0
+        self._seq = None
+        self._ticks = None  # last device ticks, unwrapped
+        self._rate_at = time.monotonic()
+        self._rate_samples = 0
+        self.recorder = None
+        self.lines = []  # (ticks_us, level, text) not printed yet
+
+    def _unwrap(self, ticks):
+        # ticks_us wraps every 2**30 us, t_us keeps counting
+        if self._ticks is None:
+            self._ticks = ticks
+            return ticks
+        last = self._ticks % protocol.TICKS_PERIOD
+        delta = (ticks - last) % protocol.TICKS_PERIOD
+        if delta > protocol.TICKS_PERIOD // 2:
+            delta -= protocol.TICKS_PERIOD  # a bit out of order
+        self._ticks += delta
+        return self._ticks
+
+    def add(self, recv, data):
+        ver = protocol.version(data)
+        if ver == protocol.V_TEXT:
+            self.lines.extend(protocol.decode(data)['lines'])
+            return
+        if ver == protocol.V7:
+            cols = self._decode_v7(data)
+        else:
+            cols = self._decode(data)
+        self.version = ver
+        self.datagrams += 1
+        n = len(cols['t_us'])
+        self.samples += n
+        cols['recv'] = [recv] * n
+        if self.out:
+            if self.recorder is None:
+                name = '%s-%s' % (self.uid, time.strftime('%Y%m%d-%H%M%S'))
+                self.recorder = Recorder(os.path.join(self.out, name), self.uid,
+                                         columns(protocol.SCHEMA_IMU), schema=protocol.SCHEMA_IMU)
+            self.recorder.extend(cols)
+
+    def _sequence(self, seq):
+        if self._seq is not None:
+            gap = (seq - self._seq - 1) & 0xFFFF
+            if gap < 0x8000:
+                self.lost += gap
+        self._seq = seq
+
+    def _decode(self, data):
+        # any version, through the generic decoder
+        packet = protocol.decode(data)
+        if packet['seq'] is not None:
+            self._sequence(packet['seq'])
+        self.status = packet['status']
+        cols = {'t_us': [self._unwrap(t) for t, _ in packet['samples']]}
+        for name, value in self.status.items():
+            cols[name] = [value] * len(packet['samples'])
+        for name in packet['samples'][0][1]:
+            cols[name] = [s[name] for _, s in packet['samples']]
+        self.latest = packet['samples'][-1][1]
+        return cols
+
+    def _decode_v7(self, data):
+        # whole columns at once, the hot path
+        _, _, schema, count, seq, ticks, interval_us = struct.unpack_from(protocol.HEADER_FORMAT, data, 0)
+        status_fields, sample_fields = protocol.SCHEMAS[schema]
+        self._sequence(seq)
+        start = protocol.HEADER_SIZE
+        status = struct.unpack_from('<%dh' % len(status_fields), data, start)
+        self.status = {f[0]: v * f[1] for f, v in zip(status_fields, status)}
+        start = protocol.sample_offset(schema, 0)
+        raw = array('h', data[start:protocol.sample_offset(schema, count)])
+        if sys.byteorder != 'little':
+            raw.byteswap()
+        width = len(sample_fields)
+        first = self._unwrap(ticks)
+        self._ticks = first + (count - 1) * interval_us
+        cols = {'t_us': [first + i * interval_us for i in range(count)]}
+        for name, value in self.status.items():
+            cols[name] = [value] * count
+        for c, (name, scale) in enumerate(sample_fields):
+            cols[name] = [v * scale for v in raw[c::width]]
+        self.latest = {name: cols[name][-1] for name, _ in sample_fields}
+        return cols
+
+    def update_rate(self, now):
+        dt = now - self._rate_at
+        if dt >= 1:
+            self.rate = (self.samples - self._rate_samples) / dt
+            self._rate_at = now
+            self._rate_samples = self.samples
+
+    def close(self):
+        if self.recorder:
+            self.recorder.close()
+
+
+class Receiver(asyncio.DatagramProtocol):
+    def __init__(self, limit=QUEUE):
+        self.queue = collections.deque(maxlen=limit)
+        self.received = 0
+
+    def datagram_received(self, data, addr):
+        self.queue.append((time.time(), data))
+        self.received += 1
+
+
+class Collector:
+    def __init__(self, out):
+        self.out = out
+        self.collars = {}
+        self.errors = 0
+        self.decoded = 0
+
+    def decode(self, queue):
+        # everything queued so far
+        while queue:
+            recv, data = queue.popleft()
+            try:
+                uid = data[:12].decode()
+                collar = self.collars.get(uid)
+                if collar is None:
+                    collar = self.collars[uid] = Collar(uid, self.out)
+                collar.add(recv, data)
+                self.decoded += 1
+            except (ValueError, KeyError, IndexError, struct.error, UnicodeError):
+                self.errors += 1
+
+    def take_lines(self):
+        # log lines decoded since the last call, per collar in order
+        for collar in self.collars.values():
+            for ticks, level, text in collar.lines:
+                yield f"{collar.uid} {ticks} {LEVELS.get(level, level)} {text}"
+            collar.lines.clear()
+
+    def table(self, receiver):
+        table = Table(title="DogSpeed Instrumentation")
+        for name, style in (("Collar", None), ("Ver", None), ("Datagrams", None), ("Samples/s", None),
+                            ("Lost", "red"), ("Vbat", "yellow"), ("Charge", "yellow"), ("Temp", None),
+                            ("FPS", None), ("Pitch", "green"), ("Roll", "blue"), ("Accel Z", "cyan")):
+            table.add_column(name, style=style, justify="right")
+        now = time.monotonic()
+        for collar in self.collars.values():
+            collar.update_rate(now)
+            s = collar.status
+            v = collar.latest
+            table.add_row(
+                collar.uid, f"{collar.version}", f"{collar.datagrams}", f"{collar.rate:.0f}",
+                f"{collar.lost}", f"{s.get('vbat', 0):.2f}", f"{s.get('soc', 0):.0f}%",
+                f"{s.get('temperature', 0):.1f}", f"{s.get('fps', 0):.0f}",
+                f"{v.get('pitch', 0):.1f}", f"{v.get('roll', 0):.1f}", f"{v.get('az', 0):.3f}")
+        table.caption = f"received {receiver.received}, decoded {self.decoded}, errors {self.errors}"
+        return table
+
+    def close(self):
+        for collar in self.collars.values():
+            collar.close()
+
+
+def multicast_socket(group, port):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+    sock.bind((group, port))
+    mreq = struct.pack('4sl', socket.inet_aton(group), socket.INADDR_ANY)
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+    sock.setblocking(False)
+    return sock
+
+
+async def run(args):
+    loop = asyncio.get_running_loop()
+    transport, receiver = await loop.create_datagram_endpoint(
+        Receiver, sock=multicast_socket(args.group, args.port))
+    collector = Collector(None if args.no_record else args.out)
+    console = Console()
+    next_draw = 0
+    try:
+        with Live(collector.table(receiver), console=console, auto_refresh=False) as live:
+            while True:
+                await asyncio.sleep(DECODE_MS / 1000)
+                collector.decode(receiver.queue)
+                for line in collector.take_lines():
+                    console.print(line, markup=False, highlight=False)
+                now = time.monotonic()
+                if now >= next_draw:
+                    next_draw = now + 1 / REFRESH_HZ
+                    live.update(collector.table(receiver), refresh=True)
+    finally:
+        transport.close()
+        collector.close()
+
+
+def parse_args(argv=None):
+    stream = {}
+    if os.path.exists(STREAM_JSON):
+        with open(STREAM_JSON) as f:
+            stream = json.load(f)
+    parser = argparse.ArgumentParser(description="receive, show and record collar telemetry")
+    parser.add_argument('--group', default=stream.get('host', '224.23.23.1'))
+    parser.add_argument('--port', type=int, default=stream.get('port', 2323))
+    parser.add_argument('--out', default='recordings', help='directory for recordings')
+    parser.add_argument('--no-record', action='store_true')
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    try:
+        asyncio.run(run(parse_args()))
+    except KeyboardInterrupt:
+        pass
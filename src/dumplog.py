@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# dumplog.py Copy the collar's flash log and turn it into recordings
+
+# Fetches /session.idx, the segment files it names (see lib/flashlog.py)
+# and /uid.json over mpremote, or reads copies from --dir, e.g. sim/flash.
+# Blocks are put back in segment order and every session becomes a
+# recording under --out in the format of recording.py, next to the
+# collector's.
+#
+#   python dumplog.py [--device /dev/ttyUSB0] [--dir sim/flash] [--out recordings]
+
+import argparse
+import json
+import os
+import struct
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lib'))
+import protocol
+from recording import Recorder
+
+COLUMNS = (('t_us', 'q'),) + tuple((name, 'f') for name, _ in protocol.LOG_FIELDS)
+
+
+def fetch(device, name, directory):
+    # a file from the device root, None if it isn't there
+    local = os.path.join(directory, name)
+    cmd = ['mpremote'] + (['connect', device] if device else []) + ['cp', ':/' + name, local]
+    if subprocess.run(cmd, stdout=subprocess.DEVNULL).returncode != 0:
+        return None
+    return local
+
+
+def index(data):
+    # (block size, segments, newest segment number) from session.idx
+    magic, version, block, _, segments, record, newest, _ = struct.unpack_from(
+        protocol.LOG_INDEX_FORMAT, data, 0)
+    if magic != protocol.LOG_MAGIC or version != protocol.LOG_VERSION:
+        raise ValueError('not a flash log index')
+    if record != protocol.LOG_RECORD_SIZE:
+        raise ValueError('record size %d, expected %d' % (record, protocol.LOG_RECORD_SIZE))
+    return block, segments, newest
+
+
+def blocks(data, block, newest, segments):
+    # [(segment, position, session, records bytes)] of one segment file;
+    # a slot still holding an older segment than the ring allows is skipped,
+    # and so is a block cut short by a power loss
+    found = []
+    for position, start in enumerate(range(0, len(data) - block + 1, block)):
+        magic, number, session, n = struct.unpack_from(protocol.LOG_BLOCK_FORMAT, data, start)
+        if magic != protocol.LOG_BLOCK_MAGIC or not newest - segments < number <= newest:
+            continue
+        start += protocol.LOG_BLOCK_SIZE
+        found.append((number, position, session, data[start:start + n * protocol.LOG_RECORD_SIZE]))
+    return found
+
+
+def sessions(found):
+    # {session: [records bytes, ...]} in order; session numbers only
+    # repeat after 65536 boots, by then the ring has long moved on
+    result = {}
+    for _, _, session, records in found:
+        result.setdefault(session, []).append(records)
+    return result
+
+
+def convert(session, chunks, uid, out):
+    path = os.path.join(out, '%s-session%d' % (uid, session))
+    recorder = Recorder(path, uid, COLUMNS, session=session, source='flash')
+    samples = 0
+    for records in chunks:
+        rows = list(struct.iter_unpack(protocol.LOG_RECORD_FORMAT, records))
+        cols = {'t_us': [r[0] * 1000 for r in rows]}
+        for i, (name, scale) in enumerate(protocol.LOG_FIELDS):
+            cols[name] = [r[i + 1] * scale for r in rows]
+        recorder.extend(cols)
+        samples += len(rows)
+    recorder.close()
+    return path, samples
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="dump the collar's flash log into recordings")
+    parser.add_argument('--device', help='serial port for mpremote, default: the first one found')
+    parser.add_argument('--dir', help='copies of session.idx and the segments instead of the device')
+    parser.add_argument('--uid', help='collar uid, default: uid.json from the device or in --dir')
+    parser.add_argument('--out', default='recordings', help='directory for recordings')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.dir:
+            def get(name):
+                path = os.path.join(args.dir, name)
+                return path if os.path.exists(path) else None
+        else:
+            def get(name):
+                return fetch(args.device, name, tmp)
+        index_file = get('session.idx')
+        if index_file is None:
+            sys.exit('no session.idx')
+        with open(index_file, 'rb') as f:
+            block, segments, newest = index(f.read())
+        found = []
+        for slot in range(segments):
+            segment_file = get('session%d.log' % slot)
+            if segment_file:
+                with open(segment_file, 'rb') as f:
+                    found.extend(blocks(f.read(), block, newest, segments))
+        found.sort()
+        uid = args.uid
+        uid_file = get('uid.json')
+        if uid is None and uid_file:
+            with open(uid_file) as f:
+                uid = json.load(f).get('uid')
+    for session, chunks in sessions(found).items():
+        path, samples = convert(session, chunks, uid or 'unknown', args.out)
+        print('session %d: %d records, %s' % (session, samples, path))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+# gateway.py Bridge collars on ESP-NOW to the collector on the LAN
+
+# The app for a second ESP32 on mains power within reach of the WiFi. It
+# keeps the station connected (/networks.json) and republishes every
+# ESP-NOW telemetry frame as a UDP datagram to the host and port in
+# /stream.json, where collector.py listens as before. Collars sending
+# with "transport": "espnow" need the channel of its access point as
+# "channel" in their stream.json.
+#
+# /gateway.json can choose the receiving side, e.g. {"transport": "local"}
+# for the stand-in on Linux, next to a collar with the same transport:
+#
+#   cd src && python -m sim --realtime --app gateway.py --duration 600
+#
+# On the board copy it to main.py, or import it from there.
+
+import ujson
+import uasyncio as asyncio
+
+import log
+import transport
+from wifi_manager import WifiManager
+
+FILE_STREAM = "/stream.json"
+FILE_GATEWAY = "/gateway.json"
+STATS_MS = 10000
+
+
+def read_json(filename):
+    try:
+        with open(filename, "r") as f:
+            return ujson.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+async def task_stats(bridge):
+    while True:
+        await asyncio.sleep_ms(STATS_MS)
+        log.info('bridge', 'received: %d, forwarded: %d, invalid: %d, failed: %d, peers: %d',
+                 bridge.received, bridge.forwarded, bridge.invalid, bridge.failed, len(bridge.peers))
+
+
+async def main():
+    stream = read_json(FILE_STREAM) or {}
+    rx = transport.create(read_json(FILE_GATEWAY) or {"transport": transport.ESPNOW})
+    tx = transport.UdpTransport(stream.get("host", "224.23.23.1"), stream.get("port", 2323))
+    wifi = WifiManager()
+    bridge = transport.Bridge(rx, tx)
+    log.info('bridge', '%s to %s:%d', type(rx).__name__, tx.addr[0], tx.addr[1])
+    await asyncio.gather(wifi.manage(), bridge.run(), task_stats(bridge), log.drain())
+
+
+asyncio.run(main())
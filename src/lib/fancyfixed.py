@@ -0,0 +1,127 @@
+# fancyfixed.py Integer color pipeline with the fancyled function surface
+
+# Colors are packed ints 0xRRGGBB with 8 bit channels, weights and
+# brightness are 8.8 fixed point (256 == 1.0) and palette positions are
+# 16 bit fractions of a cycle (0x10000 == 1.0). Gamma goes through a 256
+# entry table instead of pow(). Results match fancyled's float path to
+# within a few LSB per channel, without putting a float on the heap.
+
+from micropython import const
+
+import fancyled
+
+ONE = const(256)  # 1.0 in 8.8 fixed point
+POS_ONE = const(0x10000)  # 1.0 as palette position
+GFACTOR = fancyled.GFACTOR
+
+
+def _gamma_table(gamma_value):
+    # index is an 8 bit channel as produced by fancyled.denormalize()
+    table = bytearray(256)
+    for i in range(256):
+        table[i] = min(255, int(pow((i + 0.5) / 256.0, gamma_value) * 256.0))
+    return table
+
+
+GAMMA = _gamma_table(GFACTOR)
+_gamma_cache = {GFACTOR: GAMMA}
+
+
+def gamma_table(gamma_value=None):
+    if gamma_value is None:
+        return GAMMA
+    table = _gamma_cache.get(gamma_value)
+    if table is None:
+        table = _gamma_cache[gamma_value] = _gamma_table(gamma_value)
+    return table
+
+
+def pack(r, g, b):
+    return (clamp(r, 0, 255) << 16) | (clamp(g, 0, 255) << 8) | clamp(b, 0, 255)
+
+
+def unpack(val):
+    return (val >> 16) & 0xFF, (val >> 8) & 0xFF, val & 0xFF
+
+
+def from_crgb(color):
+    # fancyled.CRGB/CHSV or a list of them to packed ints
+    if isinstance(color, (list, tuple)):
+        return [from_crgb(c) for c in color]
+    return color.pack()
+
+
+def to_crgb(val):
+    return fancyled.CRGB((val >> 16) & 0xFF, (val >> 8) & 0xFF, val & 0xFF)
+
+
+def clamp(val, lower, upper):
+    return max(lower, min(val, upper))
+
+
+def mix(color1, color2, weight2=ONE // 2):
+    weight2 = clamp(weight2, 0, ONE)
+    weight1 = ONE - weight2
+    return ((((((color1 >> 16) & 0xFF) * weight1 + ((color2 >> 16) & 0xFF) * weight2) >> 8) << 16)
+            | (((((color1 >> 8) & 0xFF) * weight1 + ((color2 >> 8) & 0xFF) * weight2) >> 8) << 8)
+            | (((color1 & 0xFF) * weight1 + (color2 & 0xFF) * weight2) >> 8))
+
+
+def gamma_adjust(val, gamma_value=None, brightness=ONE, inplace=False):
+    # brightness is 8.8 fixed point, either one value or (red, green, blue)
+    if isinstance(val, (list, tuple)):
+        if inplace:
+            for i, x in enumerate(val):
+                val[i] = gamma_adjust(x, gamma_value, brightness)
+            return None
+        return [gamma_adjust(x, gamma_value, brightness) for x in val]
+    if isinstance(gamma_value, (list, tuple)):
+        table_red, table_green, table_blue = (
+            gamma_table(gamma_value[0]), gamma_table(gamma_value[1]), gamma_table(gamma_value[2]))
+    else:
+        table_red = table_green = table_blue = gamma_table(gamma_value)
+    if isinstance(brightness, int):
+        brightness_red = brightness_green = brightness_blue = brightness
+    else:
+        brightness_red, brightness_green, brightness_blue = brightness[0], brightness[1], brightness[2]
+    return ((min(255, (table_red[(val >> 16) & 0xFF] * brightness_red) >> 8) << 16)
+            | (min(255, (table_green[(val >> 8) & 0xFF] * brightness_green) >> 8) << 8)
+            | min(255, (table_blue[val & 0xFF] * brightness_blue) >> 8))
+
+
+def palette_lookup(palette, position):
+    # position is a 16 bit fraction of the palette, wraps around
+    weight2 = (position & 0xFFFF) * len(palette)
+    idx = weight2 >> 16
+    color1 = palette[idx]
+    color2 = palette[(idx + 1) % len(palette)]
+    return mix(color1, color2, (weight2 & 0xFFFF) >> 8)
+
+
+def expand_gradient(gradient, length):
+    # gradient is a list of (position, color), position as in palette_lookup
+    gradient = sorted(gradient)
+    least = gradient[0][0]
+    most = gradient[-1][0]
+    newlist = []
+    for i in range(length):
+        pos = i * POS_ONE // (length - 1)
+        if pos <= least:
+            below, above = 0, 0
+        elif pos >= most:
+            below, above = -1, -1
+        else:
+            below, above = 0, -1
+            for n, x in enumerate(gradient):
+                if pos >= x[0]:
+                    below = n
+            for n, x in enumerate(gradient[-1:0:-1]):
+                if pos <= x[0]:
+                    above = -1 - n
+        r = gradient[above][0] - gradient[below][0]
+        if r <= 0:
+            newlist.append(gradient[below][1])
+        else:
+            weight2 = (pos - gradient[below][0]) * ONE // r
+            newlist.append(mix(gradient[below][1], gradient[above][1], weight2))
+    return newlist
@@ -1,19 +1,247 @@
-_A=None
+# filters.py Running filters for sensor streams
+
+# update() takes one sample. update_block(buf, n, offset, stride) takes n
+# samples from an array or memoryview, e.g. a whole IMU FIFO batch, with
+# the per-sample work inlined so there is one method call per batch.
+# offset and stride pick one channel out of interleaved frames. The Multi*
+# variants filter several interleaved channels in the same pass.
+
+from array import array
+
+_INT_TYPECODES = 'bBhHiIlLqQ'
+
+
 class AverageFilter:
-    def __init__(A):A.__k=1;A.__val=0
-    def update(A,value):B=(A.__k-1)/A.__k;A.__val=B*A.__val+(1-B)*value;A.__k=A.__k+1;return A.__val
-    def get(A):return A.__val
+    # mean of everything seen so far
+    def __init__(self):
+        self.__k = 1
+        self.__val = 0
+
+    def update(self, value):
+        alpha = (self.__k - 1) / self.__k
+        self.__val = alpha * self.__val + (1 - alpha) * value
+        self.__k = self.__k + 1
+        return self.__val
+
+    def update_block(self, buf, n, offset=0, stride=1):
+        k = self.__k
+        val = self.__val
+        for i in range(offset, offset + n * stride, stride):
+            val += (buf[i] - val) / k
+            k += 1
+        self.__k = k
+        self.__val = val
+        return val
+
+    def get(self):
+        return self.__val
+
+
 class MovingAverageFilter:
-    def __init__(A,window=1):A.__val=0;A.__window=window;A.__data=_A
-    def update(A,value):
-        B=value
-        if A.__data is _A:A.__data=[B]*A.__window;A.__val=B
-        A.__data.pop(0);A.__data.append(B);A.__val=A.__val+(B-A.__data[0])/A.__window;return A.__val
-    def get(A):return A.__val
+    # mean of the last window samples, O(1) per sample at any window size
+    #
+    # Samples live in a preallocated array used as a ring. With an integer
+    # typecode the running sum is exact and update() returns the floor of
+    # the mean; with 'f' the sum is a float and gets recomputed from the
+    # ring every resync windows so rounding errors cannot pile up.
+    def __init__(self, window=1, typecode='f', resync=16):
+        self.__window = window
+        self.__data = array(typecode, [0]) * window
+        self.__int = typecode in _INT_TYPECODES
+        self.__head = 0
+        self.__sum = 0
+        self.__val = 0
+        self.__primed = False
+        self.__resync = resync
+        self.__wraps = 0
+
+    def update(self, value):
+        data = self.__data
+        window = self.__window
+        if not self.__primed:
+            for i in range(window):
+                data[i] = value
+            self.__sum = data[0] * window
+            self.__primed = True
+        head = self.__head
+        self.__sum += value - data[head]
+        data[head] = value
+        head += 1
+        if head == window:
+            head = 0
+            self.__wraps += 1
+            if self.__wraps >= self.__resync:
+                self.__wraps = 0
+                self.resync()
+        self.__head = head
+        if self.__int:
+            self.__val = self.__sum // window
+        else:
+            self.__val = self.__sum / window
+        return self.__val
+
+    def update_block(self, buf, n, offset=0, stride=1):
+        if n <= 0:
+            return self.__val
+        if not self.__primed:
+            self.update(buf[offset])
+            return self.update_block(buf, n - 1, offset + stride, stride)
+        data = self.__data
+        window = self.__window
+        head = self.__head
+        total = self.__sum
+        for i in range(offset, offset + n * stride, stride):
+            value = buf[i]
+            total += value - data[head]
+            data[head] = value
+            head += 1
+            if head == window:
+                head = 0
+                self.__wraps += 1
+        self.__head = head
+        self.__sum = total
+        if self.__wraps >= self.__resync:
+            self.__wraps = 0
+            self.resync()
+        if self.__int:
+            self.__val = self.__sum // window
+        else:
+            self.__val = self.__sum / window
+        return self.__val
+
+    def resync(self):
+        # recompute the running sum from the ring
+        total = 0
+        for x in self.__data:
+            total += x
+        self.__sum = total
+
+    def get(self):
+        return self.__val
+
+    def total(self):
+        return self.__sum
+
+
 class LowPass1Filter:
-    def __init__(A,alpha):A.__val=_A;A.__alpha=alpha
-    def update(A,value):
-        B=value
-        if A.__val==_A:A.__val=B
-        A.__val=A.__alpha*A.__val+(1-A.__alpha)*B;return A.__val
-    def get(A):return A.__val
\ No newline at end of file
+    # first order IIR, alpha is the weight of the previous output
+    def __init__(self, alpha):
+        self.__val = None
+        self.__alpha = alpha
+
+    def update(self, value):
+        if self.__val is None:
+            self.__val = value
+        self.__val = self.__alpha * self.__val + (1 - self.__alpha) * value
+        return self.__val
+
+    def update_block(self, buf, n, offset=0, stride=1):
+        if n <= 0:
+            return self.__val
+        alpha = self.__alpha
+        beta = 1 - alpha
+        val = buf[offset] if self.__val is None else self.__val
+        for i in range(offset, offset + n * stride, stride):
+            val = alpha * val + beta * buf[i]
+        self.__val = val
+        return val
+
+    def get(self):
+        return self.__val
+
+
+class MultiMovingAverageFilter:
+    # MovingAverageFilter over channels interleaved values per frame
+    def __init__(self, channels, window=1, typecode='f', resync=16):
+        self.channels = channels
+        self.__window = window
+        self.__data = array(typecode, [0]) * (window * channels)
+        self.__sums = array('i' if typecode in _INT_TYPECODES else 'f', [0]) * channels
+        self.__int = typecode in _INT_TYPECODES
+        self.values = array(self.__sums.typecode, [0]) * channels
+        self.__head = 0
+        self.__primed = False
+        self.__resync = resync
+        self.__wraps = 0
+
+    def update_block(self, buf, n, offset=0, stride=None):
+        # n frames of stride values, channels start at offset in each frame
+        channels = self.channels
+        if stride is None:
+            stride = channels
+        if n <= 0:
+            return self.values
+        data = self.__data
+        sums = self.__sums
+        window = self.__window
+        if not self.__primed:
+            for c in range(channels):
+                value = buf[offset + c]
+                for i in range(c, window * channels, channels):
+                    data[i] = value
+                sums[c] = data[c] * window
+            self.__primed = True
+        head = self.__head
+        end = window * channels
+        for i in range(offset, offset + n * stride, stride):
+            for c in range(channels):
+                value = buf[i + c]
+                sums[c] += value - data[head + c]
+                data[head + c] = value
+            head += channels
+            if head == end:
+                head = 0
+                self.__wraps += 1
+        self.__head = head
+        if self.__wraps >= self.__resync:
+            self.__wraps = 0
+            self.resync()
+        values = self.values
+        for c in range(channels):
+            if self.__int:
+                values[c] = sums[c] // window
+            else:
+                values[c] = sums[c] / window
+        return values
+
+    def resync(self):
+        channels = self.channels
+        data = self.__data
+        for c in range(channels):
+            total = 0
+            for i in range(c, len(data), channels):
+                total += data[i]
+            self.__sums[c] = total
+
+    def get(self):
+        return self.values
+
+
+class MultiLowPass1Filter:
+    # LowPass1Filter over channels interleaved values per frame
+    def __init__(self, channels, alpha):
+        self.channels = channels
+        self.__alpha = alpha
+        self.__primed = False
+        self.values = array('f', [0]) * channels
+
+    def update_block(self, buf, n, offset=0, stride=None):
+        channels = self.channels
+        if stride is None:
+            stride = channels
+        if n <= 0:
+            return self.values
+        values = self.values
+        alpha = self.__alpha
+        beta = 1 - alpha
+        if not self.__primed:
+            for c in range(channels):
+                values[c] = buf[offset + c]
+            self.__primed = True
+        for i in range(offset, offset + n * stride, stride):
+            for c in range(channels):
+                values[c] = alpha * values[c] + beta * buf[i + c]
+        return values
+
+    def get(self):
+        return self.values
@@ -0,0 +1,183 @@
+# flashlog.py Sessions of sensor records in a ring of flash segment files
+
+# record() packs into one of two RAM blocks of LOG_BLOCK bytes, only run()
+# writes, a full block at a time while the next one fills; record() itself
+# never touches the flash. If both are full the newer records are dropped
+# and counted.
+#
+# Files are only ever appended to. littlefs copies everything after a spot
+# that gets rewritten in place, so a header at the front of one big file
+# would cost the whole file each time. Blocks go to the end of the current
+# segment file; after SEGMENT_BLOCKS of them the next segment starts in the
+# next of SEGMENTS files, truncating the oldest one. The index (layouts in
+# protocol.py) is a few bytes, rewritten only when a segment starts. Every
+# boot is a new session in a new segment; sync() appends what is buffered
+# as a short block, e.g. before sleep.
+#
+# The flash write itself blocks, so a block goes out in WRITE_CHUNK pieces
+# with a yield after each: the loop waits for a piece and maybe an erase,
+# not for the whole block.
+#
+# dumplog.py copies the files over mpremote and turns them into recordings
+# like collector.py makes.
+
+import struct
+
+import uasyncio as asyncio
+import utime
+from micropython import const
+
+import log
+import protocol
+
+INDEX = '/session.idx'
+SEGMENT = '/session%d.log'  # %d is the slot, segment number % segments
+SEGMENTS = const(16)
+SEGMENT_BLOCKS = const(4)  # 16 KB, 256 KB of records in all
+WRITE_CHUNK = const(1024)
+_OLD_FILE = '/session.log'  # log version 1, emptied once
+_BLOCK = protocol.LOG_BLOCK
+_RECORD = protocol.LOG_RECORD_SIZE
+
+
+class FlashLog:
+    def __init__(self, index=INDEX, segment=SEGMENT, segments=SEGMENTS, segment_blocks=SEGMENT_BLOCKS,
+                 every=1, sample_ms=20):
+        self.index = index
+        self.segment = segment
+        self.segments = segments
+        self.segment_blocks = segment_blocks
+        self.every = every
+        self.sample_ms = sample_ms
+        self.per_block = (_BLOCK - protocol.LOG_BLOCK_SIZE) // _RECORD
+        self._bufs = (bytearray(_BLOCK), bytearray(_BLOCK))
+        self._pieces = tuple(tuple(memoryview(buf)[i:i + WRITE_CHUNK] for i in range(0, _BLOCK, WRITE_CHUNK))
+                             for buf in self._bufs)
+        self._cur = 0  # buffer being filled
+        self._fill = 0  # records in it
+        self._full = None  # buffer waiting for run()
+        self._ready = asyncio.Event()
+        self._lock = asyncio.Lock()  # one block write at a time
+        self._skip = 0
+        self.records = 0
+        self.dropped = 0
+        self.writes = 0
+        self.number = 0  # of the current segment
+        self.blocks = 0  # written to it
+        self.session = 0
+        self._f = None
+        self._start = utime.ticks_ms()
+
+    def open(self):
+        try:
+            with open(self.index, 'rb') as f:
+                index = f.read(protocol.LOG_INDEX_SIZE)
+        except OSError:
+            index = b''
+            self._empty_old()
+        number = session = 0
+        if len(index) == protocol.LOG_INDEX_SIZE:
+            magic, version, block, segment_blocks, segments, record, number, session = struct.unpack(
+                protocol.LOG_INDEX_FORMAT, index)
+            if (magic != protocol.LOG_MAGIC or version != protocol.LOG_VERSION or block != _BLOCK
+                    or segment_blocks != self.segment_blocks or segments != self.segments
+                    or record != _RECORD):
+                log.info('flashlog', 'other layout in %s, starting over', self.index)
+                number = session = 0
+        self.session = (session + 1) & 0xFFFF
+        self._start_segment(number + 1)
+        self._start = utime.ticks_ms()
+        log.info('flashlog', 'session %d, segment %d', self.session, self.number)
+
+    def _empty_old(self):
+        # the single preallocated file of version 1 held 260 KB
+        try:
+            open(_OLD_FILE, 'rb').close()
+        except OSError:
+            return
+        open(_OLD_FILE, 'wb').close()
+        log.info('flashlog', 'emptied %s', _OLD_FILE)
+
+    def _start_segment(self, number):
+        # index first: if power goes in between, the next boot skips a number
+        if self._f is not None:
+            self._f.close()
+        self.number = number
+        self.blocks = 0
+        with open(self.index, 'wb') as f:
+            f.write(struct.pack(protocol.LOG_INDEX_FORMAT, protocol.LOG_MAGIC, protocol.LOG_VERSION,
+                                _BLOCK, self.segment_blocks, self.segments, _RECORD, number,
+                                self.session))
+        self._f = open(self.segment % (number % self.segments), 'wb')
+
+    async def _write(self, i, count):
+        # buffer i as the next block, appended in WRITE_CHUNK pieces
+        if self.blocks == self.segment_blocks:
+            self._start_segment(self.number + 1)
+        struct.pack_into(protocol.LOG_BLOCK_FORMAT, self._bufs[i], 0, protocol.LOG_BLOCK_MAGIC,
+                         self.number, self.session, count)
+        for piece in self._pieces[i]:
+            self._f.write(piece)
+            await asyncio.sleep_ms(0)
+        self._f.flush()
+        self.blocks += 1
+        self.writes += 1
+
+    def record(self, t, ax, ay, az, pitch, roll, activity, speed, gait, vbat, soc):
+        # t in ms since the session started, the rest raw as in LOG_FIELDS
+        if self._skip:
+            self._skip -= 1
+            return
+        self._skip = self.every - 1
+        buf = self._bufs[self._cur]
+        struct.pack_into(protocol.LOG_RECORD_FORMAT, buf,
+                         protocol.LOG_BLOCK_SIZE + self._fill * _RECORD,
+                         t, ax, ay, az, pitch, roll, activity, speed, gait, vbat, soc)
+        self._fill += 1
+        self.records += 1
+        if self._fill < self.per_block:
+            return
+        self._fill = 0
+        if self._full is not None:
+            # run() hasn't caught up, this block goes
+            self.dropped += self.per_block
+            return
+        self._full = self._cur
+        self._cur ^= 1
+        self._ready.set()
+
+    def frames(self, samples, n, stride, pitch, roll, activity, speed, gait, vbat, soc):
+        # n FIFO frames (gyro xyz, accel xyz), the last one taken just now
+        now = utime.ticks_diff(utime.ticks_ms(), self._start)
+        for k in range(n):
+            i = k * stride
+            self.record(now + (k + 1 - n) * self.sample_ms,
+                        samples[i + 3], samples[i + 4], samples[i + 5],
+                        pitch, roll, activity, speed, gait, vbat, soc)
+
+    async def sync(self):
+        # what is buffered, as a short block
+        async with self._lock:
+            await self._flush_full()
+            if self._fill:
+                # record() goes on in the other buffer meanwhile
+                i, count = self._cur, self._fill
+                self._full = i
+                self._cur ^= 1
+                self._fill = 0
+                await self._write(i, count)
+                self._full = None
+
+    async def _flush_full(self):
+        if self._full is not None:
+            await self._write(self._full, self.per_block)
+            self._full = None
+
+    async def run(self):
+        if self._f is None:
+            self.open()
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            async with self._lock:
+                await self._flush_full()
@@ -0,0 +1,48 @@
+# frame.py Preallocated frame buffer on top of a NeoPixel driver
+
+# The frame shares its bytearray with the driver, so animations write raw
+# bytes in driver order and show() hands the whole buffer over in a single
+# write(). Nothing in here allocates after construction, colors are built
+# once up front with color(). Passing buf creates an offscreen frame with
+# the same layout, which is only sent out by copying it into a driver frame.
+
+# neopixel.NeoPixel.ORDER, position of r, g, b, w inside a pixel
+ORDER = (1, 0, 2, 3)
+
+
+class FrameBuffer:
+    def __init__(self, np, buf=None):
+        self.np = np
+        self.n = np.n
+        self.bpp = np.bpp
+        self.buf = np.buf if buf is None else buf
+        self.mv = memoryview(self.buf)
+        self._blank = bytes(len(self.buf))
+
+    def color(self, r, g, b, w=0):
+        # one pixel in driver byte order, build these outside the frame loop
+        c = bytearray(self.bpp)
+        v = (r, g, b, w)
+        for i in range(self.bpp):
+            c[ORDER[i]] = v[i]
+        return bytes(c)
+
+    def set(self, i, c):
+        j = i * self.bpp
+        self.mv[j:j + self.bpp] = c
+
+    def fill(self, c):
+        bpp = self.bpp
+        mv = self.mv
+        for j in range(0, len(self.buf), bpp):
+            mv[j:j + bpp] = c
+
+    def clear(self):
+        self.mv[:] = self._blank
+
+    def blit(self, src):
+        # src is a full frame in driver order
+        self.mv[:] = src
+
+    def show(self):
+        self.np.write()
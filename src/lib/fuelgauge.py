@@ -0,0 +1,92 @@
+# fuelgauge.py Battery voltage, state of charge and runtime for a LiPo cell
+
+# update() averages a burst of calibrated ADC readings (read_uv), smooths
+# them over time and only moves the published voltage once it is
+# HYST_MV away, so values near a threshold do not flicker. The state of
+# charge comes from a LiPo discharge curve, the drain rate from how fast
+# it goes down over RATE_MS and the runtime from both. All in ints:
+# mV, permille of charge, permille per hour and minutes.
+
+from micropython import const
+import utime
+
+import filters
+
+SAMPLES = const(16)
+HYST_MV = const(8)
+RATE_MS = const(300000)  # drain rate from 5 minute steps
+NO_BATTERY_MV = const(3000)  # below this it runs on USB without a cell
+
+# (mV, permille) under light load, from full to empty
+CURVE = (
+    (4200, 1000), (4150, 950), (4110, 900), (4080, 850), (4020, 800),
+    (3980, 750), (3950, 700), (3910, 650), (3870, 600), (3850, 550),
+    (3840, 500), (3820, 450), (3800, 400), (3790, 350), (3770, 300),
+    (3750, 250), (3730, 200), (3710, 150), (3690, 100), (3610, 50),
+    (3270, 0),
+)
+
+
+def soc(mv, curve=CURVE):
+    # permille for a cell voltage, linear between the curve points
+    if mv >= curve[0][0]:
+        return curve[0][1]
+    for i in range(1, len(curve)):
+        hi_mv, hi_pm = curve[i - 1]
+        lo_mv, lo_pm = curve[i]
+        if mv >= lo_mv:
+            return lo_pm + (hi_pm - lo_pm) * (mv - lo_mv) // (hi_mv - lo_mv)
+    return 0
+
+
+class FuelGauge:
+    def __init__(self, adc, divider=2.18, samples=SAMPLES, alpha=0.7, curve=CURVE):
+        self.adc = adc
+        self.divider = divider
+        self.samples = samples
+        self.curve = curve
+        self.mv = 0  # published cell voltage
+        self.soc = 0  # permille
+        self.drain = None  # permille per hour, negative while charging
+        self.runtime = None  # minutes left at the current drain
+        self._filter = filters.LowPass1Filter(alpha)
+        self._rate_at = None
+        self._rate_soc = 0
+
+    def read_mv(self):
+        # cell voltage from one burst of readings
+        total = 0
+        for _ in range(self.samples):
+            total += self.adc.read_uv()
+        return int(total * self.divider / (self.samples * 1000))
+
+    def update(self):
+        # returns True when the published values changed
+        mv = int(self._filter.update(self.read_mv()))
+        changed = abs(mv - self.mv) >= HYST_MV
+        if changed:
+            self.mv = mv
+            self.soc = soc(mv, self.curve) if mv >= NO_BATTERY_MV else 0
+        self._update_rate()
+        return changed
+
+    def present(self):
+        return self.mv >= NO_BATTERY_MV
+
+    def charging(self):
+        return self.drain is not None and self.drain < 0
+
+    def _update_rate(self):
+        now = utime.ticks_ms()
+        if self._rate_at is None:
+            self._rate_at = now
+            self._rate_soc = self.soc
+            return
+        elapsed = utime.ticks_diff(now, self._rate_at)
+        if elapsed < RATE_MS:
+            return
+        rate = (self._rate_soc - self.soc) * 3600000 // elapsed
+        self.drain = rate if self.drain is None else (3 * self.drain + rate) // 4
+        self._rate_at = now
+        self._rate_soc = self.soc
+        self.runtime = self.soc * 60 // self.drain if self.drain > 0 else None
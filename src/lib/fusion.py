@@ -0,0 +1,96 @@
+# fusion.py Complementary filter for pitch, roll and activity
+
+# Works on batches of BMI160 FIFO frames (gyro xyz, accel xyz, raw int16).
+# Gyro rates are integrated per frame, the accelerometer tilt corrects the
+# drift once per batch with the filter weight raised to the batch length,
+# so the result matches a per-sample complementary filter while atan2 and
+# friends only run once per batch. All state is preallocated.
+#
+# activity is a smoothed motion level in deg/s: summed absolute rotation
+# plus how far the acceleration magnitude is from 1 g (1 g off ~ 128).
+
+from array import array
+from math import atan2, degrees, sqrt
+
+from micropython import const
+
+ACCEL_LSB_G = const(8192)  # +-4g
+GYRO_LSB_DPS = const(131)  # +-250 deg/s
+ACTIVITY_SHIFT = const(4)  # activity EWMA weight 1/16 per frame
+_ACCEL_SHIFT = const(4)  # keeps squared magnitudes in small ints
+_DEV_SHIFT = const(12)
+
+
+class Fusion:
+    def __init__(self, odr=50, alpha=0.98, capacity=85,
+                 accel_lsb=ACCEL_LSB_G, gyro_lsb=GYRO_LSB_DPS):
+        self.pitch = 0.0
+        self.roll = 0.0
+        self.activity = 0
+        self.gyro_lsb = gyro_lsb
+        # raw gyro sum to degrees
+        self._deg_per_lsb = 1 / (odr * gyro_lsb)
+        # alpha ** n for a batch of n frames
+        self._alpha = array('f', [alpha ** n for n in range(capacity + 1)])
+        g = accel_lsb >> _ACCEL_SHIFT
+        self._g2 = g * g
+        self._primed = False
+
+    def update_block(self, buf, n, stride=6, out=None):
+        # n frames from buf, per-frame activity goes to out if given
+        if n <= 0:
+            return
+        gyro_lsb = self.gyro_lsb
+        g2 = self._g2
+        act = self.activity
+        sgx = sgy = 0
+        sax = say = saz = 0
+        k = 0
+        for i in range(0, n * stride, stride):
+            gx = buf[i]
+            gy = buf[i + 1]
+            gz = buf[i + 2]
+            ax = buf[i + 3]
+            ay = buf[i + 4]
+            az = buf[i + 5]
+            sgx += gx
+            sgy += gy
+            sax += ax
+            say += ay
+            saz += az
+            ax >>= _ACCEL_SHIFT
+            ay >>= _ACCEL_SHIFT
+            az >>= _ACCEL_SHIFT
+            x = ((abs(gx) + abs(gy) + abs(gz)) // gyro_lsb
+                 + (abs(ax * ax + ay * ay + az * az - g2) >> _DEV_SHIFT))
+            act += (x - act) >> ACTIVITY_SHIFT
+            if out is not None:
+                out[k] = act
+            k += 1
+        self.activity = act
+
+        # tilt from the mean acceleration of the batch
+        fax = float(sax)
+        fay = float(say)
+        faz = float(saz)
+        roll_acc = degrees(atan2(fay, faz))
+        pitch_acc = degrees(atan2(-fax, sqrt(fay * fay + faz * faz)))
+        if not self._primed:
+            self.roll = roll_acc
+            self.pitch = pitch_acc
+            self._primed = True
+            return
+        beta = 1 - self._alpha[n]
+        roll = self.roll + sgx * self._deg_per_lsb
+        pitch = self.pitch + sgy * self._deg_per_lsb
+        self.roll = _wrap(roll + beta * _wrap(roll_acc - roll))
+        self.pitch = _wrap(pitch + beta * _wrap(pitch_acc - pitch))
+
+
+def _wrap(angle):
+    # into -180..180
+    if angle > 180:
+        return angle - 360
+    if angle < -180:
+        return angle + 360
+    return angle
@@ -0,0 +1,151 @@
+# gait.py Step detection, cadence and gait from the accelerometer stream
+
+# Works on batches of BMI160 FIFO frames like fusion.py, in small ints and
+# with constant work per sample:
+#
+# - deviation of |a|^2 from 1 g, about 256 per g, so orientation and the
+#   axis the collar happens to hang on do not matter
+# - smoothed against sample noise, minus a slow baseline
+# - a step is a local maximum above half of the recent peak envelope (and
+#   above a floor), at least STEP_MIN_MS after the previous step
+# - cadence in steps/min from the last STEP_HISTORY intervals
+# - gait from cadence with some hysteresis, speed from cadence times the
+#   step length of that gait
+#
+# Step lengths depend on the dog and are cm per step, see STEP_CM.
+
+from array import array
+from micropython import const
+
+REST = const(0)
+WALK = const(1)
+TROT = const(2)
+RUN = const(3)
+NAMES = ('rest', 'walk', 'trot', 'run')
+
+ACCEL_LSB_G = const(8192)  # +-4g
+STEP_MIN_MS = const(200)  # faster than 300 steps/min is noise
+STEP_MAX_MS = const(1500)  # slower than 40 steps/min is standing around
+STEP_HISTORY = const(8)  # intervals averaged for the cadence
+PEAK_MIN = const(40)  # ~0.15 g
+TROT_SPM = const(132)  # cadence thresholds, steps/min
+RUN_SPM = const(180)
+HYST_SPM = const(6)
+STEP_CM = (0, 50, 80, 130)  # per gait, medium sized dog
+
+_ACCEL_SHIFT = const(4)
+_DEV_SHIFT = const(11)
+_SMOOTH_SHIFT = const(2)  # ~80 ms at 50 Hz
+_BASE_SHIFT = const(6)  # ~1.3 s at 50 Hz
+_ENV_DECAY_SHIFT = const(7)
+
+
+def classify(cadence, current=REST):
+    # gait for a cadence in steps/min, current adds hysteresis
+    if cadence <= 0:
+        return REST
+    trot = TROT_SPM + (HYST_SPM if current < TROT else -HYST_SPM)
+    run = RUN_SPM + (HYST_SPM if current < RUN else -HYST_SPM)
+    if cadence >= run:
+        return RUN
+    if cadence >= trot:
+        return TROT
+    return WALK
+
+
+class GaitDetector:
+    def __init__(self, odr=50, accel_lsb=ACCEL_LSB_G, step_cm=STEP_CM):
+        self.odr = odr
+        self.step_cm = step_cm
+        self.steps = 0
+        self.cadence = 0  # steps/min
+        self.gait = REST
+        self.speed = 0  # cm/s
+        g = accel_lsb >> _ACCEL_SHIFT
+        self._g2 = g * g
+        self._min_gap = STEP_MIN_MS * odr // 1000
+        self._max_gap = STEP_MAX_MS * odr // 1000
+        self._intervals = array('H', [0]) * STEP_HISTORY
+        self._head = 0
+        self._count = 0  # valid entries in _intervals
+        self._total = 0  # their sum
+        self._since = self._max_gap + 1  # samples since the last step
+        self._smooth = 0
+        self._base = 0
+        self._env = 0
+        self._prev = 0
+        self._rising = False
+
+    def reset(self):
+        self._count = 0
+        self._total = 0
+        self.cadence = 0
+        self.gait = REST
+        self.speed = 0
+
+    def update_block(self, buf, n, stride=6, offset=3):
+        # n frames from buf, offset is the index of ax in a frame
+        # returns the number of steps found in the batch
+        g2 = self._g2
+        smooth = self._smooth
+        base = self._base
+        env = self._env
+        prev = self._prev
+        rising = self._rising
+        since = self._since
+        min_gap = self._min_gap
+        max_gap = self._max_gap
+        found = 0
+        for i in range(offset, offset + n * stride, stride):
+            ax = buf[i] >> _ACCEL_SHIFT
+            ay = buf[i + 1] >> _ACCEL_SHIFT
+            az = buf[i + 2] >> _ACCEL_SHIFT
+            dev = (ax * ax + ay * ay + az * az - g2) >> _DEV_SHIFT
+            smooth += (dev - smooth) >> _SMOOTH_SHIFT
+            base += (smooth - base) >> _BASE_SHIFT
+            x = smooth - base
+            env -= env >> _ENV_DECAY_SHIFT
+            since += 1
+            if x < prev and rising:
+                # prev was a local maximum
+                threshold = env >> 1
+                if threshold < PEAK_MIN:
+                    threshold = PEAK_MIN
+                if prev >= threshold and since > min_gap:
+                    env += (prev - env) >> 2
+                    self._step(since - 1)
+                    since = 1
+                    found += 1
+            if x != prev:
+                # a flat top still counts as one maximum
+                rising = x > prev
+            prev = x
+            if since > max_gap:
+                since = max_gap + 1
+                if self._count:
+                    self.reset()
+        self._smooth = smooth
+        self._base = base
+        self._env = env
+        self._prev = prev
+        self._rising = rising
+        self._since = since
+        return found
+
+    def _step(self, gap):
+        self.steps += 1
+        if gap > self._max_gap:
+            # first step after a pause, nothing to measure yet
+            return
+        intervals = self._intervals
+        head = self._head
+        if self._count < STEP_HISTORY:
+            self._count += 1
+        else:
+            self._total -= intervals[head]
+        intervals[head] = gap
+        self._total += gap
+        self._head = (head + 1) % STEP_HISTORY
+        self.cadence = 60 * self.odr * self._count // self._total
+        self.gait = classify(self.cadence, self.gait)
+        self.speed = self.cadence * self.step_cm[self.gait] // 60
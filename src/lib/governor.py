@@ -0,0 +1,62 @@
+# governor.py Fixed frame budget scheduling for render loops
+
+# Frames are scheduled on a fixed grid of deadlines, the render time is
+# subtracted from the sleep so the frame rate does not drift with CPU load.
+# A frame that finishes after its deadline counts as late, whole frame slots
+# that passed in the meantime count as dropped and are skipped rather than
+# rendered in a burst.
+
+import uasyncio as asyncio
+import utime
+
+
+class FrameGovernor:
+    def __init__(self, fps=30, min_fps=1, max_fps=100):
+        self.min_fps = min_fps
+        self.max_fps = max_fps
+        self.frames = 0
+        self.late = 0
+        self.dropped = 0
+        self.busy_ms = 0  # render time of the last frame
+        self.busy_max_ms = 0
+        self.set_fps(fps)
+        self._start = utime.ticks_ms()
+        self._deadline = self._start
+
+    def set_fps(self, fps):
+        fps = max(self.min_fps, min(fps, self.max_fps))
+        self.fps = fps
+        self.period_ms = 1000 // fps
+
+    def start(self):
+        # mark the beginning of the render work of a frame
+        self._start = utime.ticks_ms()
+
+    async def wait(self):
+        # sleep for what is left of the frame budget
+        now = utime.ticks_ms()
+        period = self.period_ms
+        self.frames += 1
+        self.busy_ms = utime.ticks_diff(now, self._start)
+        if self.busy_ms > self.busy_max_ms:
+            self.busy_max_ms = self.busy_ms
+        deadline = utime.ticks_add(self._deadline, period)
+        remaining = utime.ticks_diff(deadline, now)
+        if remaining < 0:
+            self.late += 1
+            missed = -remaining // period
+            self.dropped += missed
+            deadline = utime.ticks_add(deadline, (missed + 1) * period)
+            remaining = utime.ticks_diff(deadline, now)
+        elif remaining > period:
+            # fps was raised or the clock jumped, restart the grid
+            deadline = utime.ticks_add(now, period)
+            remaining = period
+        self._deadline = deadline
+        await asyncio.sleep_ms(remaining)
+
+    def reset_stats(self):
+        self.frames = 0
+        self.late = 0
+        self.dropped = 0
+        self.busy_max_ms = 0
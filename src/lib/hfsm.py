@@ -27,11 +27,11 @@ class State:
 		if A._child_state_machine and A._child_state_machine==B:raise ValueError(_E)
 		A._parent_state_machine=B
 	def start(A,data):
-		log.debug(_G,f"Entering {A._name}")
+		log.debug(_G,'Entering %s',A._name)
 		for B in A._entry_callbacks:B(data)
 		if A._child_state_machine is not _A:A._child_state_machine.start(data)
 	def stop(A,data):
-		log.debug(_G,f"Exiting {A._name}")
+		log.debug(_G,'Exiting %s',A._name)
 		for B in A._exit_callbacks:B(data)
 		if A._child_state_machine is not _A:A._child_state_machine.stop(data)
 	def has_child_sm(A):return _B if A._child_state_machine else _C
@@ -70,7 +70,7 @@ class NormalTransition(Transition):
 	def __call__(A,data):
 		B=data
 		if not A._condition or A._condition(B):
-			log.info(_G,f"NormalTransition from {A._from} to {A._to} caused by {A._event}")
+			log.info(_G,'NormalTransition from %s to %s caused by %s',A._from,A._to,A._event)
 			if A._action:A._action(B)
 			A._from.stop(B);A._to.start(B)
 	def __repr__(A):return f"Transition {A._from} to {A._to} by {A._event}"
@@ -79,7 +79,7 @@ class SelfTransition(Transition):
 	def __call__(A,data):
 		B=data
 		if not A._condition or A._condition(B):
-			log.info(_G,f"SelfTransition {A._state}")
+			log.info(_G,'SelfTransition %s',A._state)
 			if A._action:A._action(B)
 			A._state.stop(B);A._state.start(B)
 	def __repr__(A):return f"SelfTransition on {A._state}"
@@ -87,7 +87,7 @@ class NullTransition(Transition):
 	def __init__(B,source_state,event):A=source_state;super().__init__(event,A,A);B._state=A
 	def __call__(A,data):
 		if not A._condition or A._condition(data):
-			log.info(_G,f"NullTransition {A._state}")
+			log.info(_G,'NullTransition %s',A._state)
 			if A._action:A._action(data)
 	def __repr__(A):return f"NullTransition on {A._state}"
 class StateMachine:
@@ -130,14 +130,14 @@ class StateMachine:
 		E=propagate;D=data;B=evt;F=_C
 		if not A._initial_state:raise ValueError(_D)
 		if A._current_state is _A:raise ValueError(_F)
-		if E and A._current_state.has_child_sm():log.debug(_G,f"Propagating evt {B} from {A} to {A._current_state.child_sm}");A._current_state.child_sm.trigger_event(B,D,E)
+		if E and A._current_state.has_child_sm():log.debug(_G,'Propagating evt %s from %s to %s',B,A,A._current_state.child_sm);A._current_state.child_sm.trigger_event(B,D,E)
 		else:
 			for C in A._transitions:
 				if C.source_state==A._current_state and C.event==B:
 					A._current_state=C.destination_state;C(D)
 					if isinstance(A._current_state,ExitState)and A._exit_callback and not A._exited:A._exited=_B;A._exit_callback(A._current_state,D)
 					F=_B;break
-			if not F:log.warning(_G,f"Event {B} is not valid in state {A._current_state}")
+			if not F:log.warning(_G,'Event %s is not valid in state %s',B,A._current_state)
 	@property
 	def exit_state(self):return self._exit_state
 	@property
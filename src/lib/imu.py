@@ -0,0 +1,169 @@
+# imu.py Interrupt driven BMI160 FIFO reader
+
+# The BMI160 collects accel and gyro frames in its FIFO at the configured
+# output data rate and raises INT1 once the watermark is reached. The
+# interrupt only sets a ThreadSafeFlag, the task then fetches interrupt
+# status and FIFO length in one transfer and the whole FIFO in a second
+# one, straight into a preallocated array. The CPU sleeps in between.
+#
+# Frames land in an int16 array that is the decoded sample already, since
+# the sensor and the ESP32 are both little endian.
+#
+# suspend() and resume() switch between that and a low power mode for
+# sleeping: gyro suspended, accelerometer in low power mode and the
+# any-motion interrupt latched on INT1, which can wake the ESP32.
+#
+# Sensor rates and ranges are still configured through the BMI160 driver.
+
+from array import array
+from machine import Pin
+from micropython import const
+import uasyncio as asyncio
+
+ADDR = const(0x68)
+
+_INT_STATUS_0 = const(0x1C)  # int status 0..3, temperature, fifo length
+_FIFO_DATA = const(0x24)
+_FIFO_CONFIG_0 = const(0x46)
+_FIFO_CONFIG_1 = const(0x47)
+_INT_EN_0 = const(0x50)
+_INT_EN_1 = const(0x51)
+_INT_OUT_CTRL = const(0x53)
+_INT_LATCH = const(0x54)
+_INT_MAP_0 = const(0x55)
+_INT_MAP_1 = const(0x56)
+_INT_MOTION_0 = const(0x5F)
+_INT_MOTION_1 = const(0x60)
+_CMD = const(0x7E)
+
+_FIFO_GYR_EN = const(0x80)
+_FIFO_ACC_EN = const(0x40)
+_INT_FWM = const(0x40)  # INT_EN_1 and INT_MAP_1 (INT1)
+_INT_ANYMO_EN = const(0x07)  # INT_EN_0, x y z
+_INT_ANYMO = const(0x04)  # INT_MAP_0 (INT1)
+_INT_LATCHED = const(0x0F)
+_INT1_OUTPUT_EN = const(0x08)
+_INT1_LVL_HIGH = const(0x02)
+_INT_STATUS_NOMO = const(0x80)  # INT_STATUS_1
+_CMD_FIFO_FLUSH = const(0xB0)
+_CMD_INT_RESET = const(0xB1)  # clears latched interrupts
+_CMD_ACC_NORMAL = const(0x11)
+_CMD_ACC_LOW_POWER = const(0x12)
+_CMD_GYR_SUSPEND = const(0x14)
+_CMD_GYR_NORMAL = const(0x15)
+
+ANY_MOTION_THRESHOLD = const(20)  # 7.81 mg per LSB at +-4g
+FIFO_BYTES = const(1024)
+FRAME_BYTES = const(12)  # headerless frame: gyro xyz, accel xyz, int16 le
+FRAME_VALUES = const(6)
+GX = const(0)
+GY = const(1)
+GZ = const(2)
+AX = const(3)
+AY = const(4)
+AZ = const(5)
+
+
+class Bmi160:
+    def __init__(self, i2c, addr=ADDR):
+        self.i2c = i2c
+        self.addr = addr
+        self._status = bytearray(8)
+        self._reg = bytearray(1)
+
+    def _write(self, reg, val):
+        self._reg[0] = val
+        self.i2c.writeto_mem(self.addr, reg, self._reg)
+
+    def _read(self, reg):
+        self.i2c.readfrom_mem_into(self.addr, reg, self._reg)
+        return self._reg[0]
+
+    def read_status(self):
+        # interrupt status, temperature and fifo length in one transfer
+        self.i2c.readfrom_mem_into(self.addr, _INT_STATUS_0, self._status)
+        return self._status
+
+    def temperature(self):
+        # degrees C from the last read_status()
+        raw = self._status[4] | (self._status[5] << 8)
+        if raw & 0x8000:
+            raw -= 0x10000
+        return 23 + raw / 512
+
+
+class ImuFifo(Bmi160):
+    def __init__(self, i2c, pin, addr=ADDR, watermark=8):
+        super().__init__(i2c, addr)
+        self.pin = pin
+        self.watermark = watermark  # frames
+        capacity = FIFO_BYTES // FRAME_BYTES
+        # frames * FRAME_VALUES int16, decoded by reading straight into it
+        self.samples = array('h', bytes(capacity * FRAME_BYTES))
+        mv = memoryview(self.samples)
+        self._views = [mv[:n * FRAME_VALUES] for n in range(capacity + 1)]
+        self.flag = asyncio.ThreadSafeFlag()
+        self.frames = 0  # frames in samples after the last read
+        self.batches = 0
+        self.zero_motion = False
+
+    def start(self):
+        self._write(_FIFO_CONFIG_0, self.watermark * FRAME_BYTES // 4)
+        self._write(_FIFO_CONFIG_1, _FIFO_GYR_EN | _FIFO_ACC_EN)
+        # INT1 push-pull, active high, not latched
+        self._write(_INT_OUT_CTRL, (self._read(_INT_OUT_CTRL) & 0xF0) | _INT1_OUTPUT_EN | _INT1_LVL_HIGH)
+        self._write(_INT_LATCH, self._read(_INT_LATCH) & 0xF0)
+        self._write(_INT_MAP_1, self._read(_INT_MAP_1) | _INT_FWM)
+        self._write(_CMD, _CMD_FIFO_FLUSH)
+        self.pin.irq(handler=self._irq, trigger=Pin.IRQ_RISING)
+        self._write(_INT_EN_1, self._read(_INT_EN_1) | _INT_FWM)
+
+    def stop(self):
+        self._write(_INT_EN_1, self._read(_INT_EN_1) & ~_INT_FWM)
+        self.pin.irq(handler=None)
+        self._write(_FIFO_CONFIG_1, 0)
+
+    async def suspend(self, threshold=ANY_MOTION_THRESHOLD, samples=2):
+        # FIFO off, any-motion on INT1 held until resume()
+        self.stop()
+        self._write(_INT_MOTION_0, (self._read(_INT_MOTION_0) & 0xFC) | (samples - 1))
+        self._write(_INT_MOTION_1, threshold)
+        self._write(_INT_MAP_0, self._read(_INT_MAP_0) | _INT_ANYMO)
+        self._write(_INT_LATCH, (self._read(_INT_LATCH) & 0xF0) | _INT_LATCHED)
+        self._write(_INT_EN_0, self._read(_INT_EN_0) | _INT_ANYMO_EN)
+        self._write(_CMD, _CMD_GYR_SUSPEND)
+        await asyncio.sleep_ms(5)
+        self._write(_CMD, _CMD_ACC_LOW_POWER)
+        await asyncio.sleep_ms(5)
+
+    async def resume(self):
+        # back to normal mode and FIFO batches
+        self._write(_INT_EN_0, self._read(_INT_EN_0) & ~_INT_ANYMO_EN)
+        self._write(_INT_MAP_0, self._read(_INT_MAP_0) & ~_INT_ANYMO)
+        self._write(_CMD, _CMD_INT_RESET)
+        self._write(_CMD, _CMD_ACC_NORMAL)
+        await asyncio.sleep_ms(5)
+        self._write(_CMD, _CMD_GYR_NORMAL)
+        await asyncio.sleep_ms(80)  # gyro start-up
+        self.zero_motion = False
+        self.start()
+
+    def _irq(self, pin):
+        self.flag.set()
+
+    def drain(self):
+        # returns the number of frames now in samples
+        status = self.read_status()
+        self.zero_motion = bool(status[1] & _INT_STATUS_NOMO)
+        length = (status[6] | (status[7] << 8)) & 0x7FF
+        frames = length // FRAME_BYTES
+        if frames:
+            self.i2c.readfrom_mem_into(self.addr, _FIFO_DATA, self._views[frames])
+        self.frames = frames
+        self.batches += 1
+        return frames
+
+    async def read(self):
+        # waits for the watermark interrupt, then drains the FIFO
+        await self.flag.wait()
+        return self.drain()
@@ -1,27 +1,220 @@
-import sys,utime
+# log.py Deferred logging through a ring of records
+
+# debug() .. critical() only check the level of the tag and store
+# (ticks_us, level, tag id, msg, args) in a ring of RING preallocated
+# slots. Formatting and printing to the UART happen later, in the drain()
+# task a record at a time, or in flush(). A call from a hot task costs a
+# level check and a few stores, the *args tuple of the call is all it
+# allocates; below the level nothing is kept. When records come faster
+# than drain() prints them the oldest unprinted go, counted in dropped.
+#
+# As before all of it goes with -O, through __debug__.
+#
+# level is the default, set_level(tag, level) overrides it for one tag.
+# The ring also keeps what has been printed already, dump() prints it
+# again, e.g. from aiorepl after connecting:
+#
+#   --> import log; log.dump('imu')
+#
+# Records at forward level or above are also counted for the radio until
+# sent() says they went out, see LogLines in telemetry.py. Once the ring
+# wraps over an unsent one it is gone for the radio too.
+
+import sys
+from array import array
+
+import uasyncio as asyncio
+import utime
 from micropython import const
-if False:from typing import Any
-NOTSET=const(0)
-DEBUG=const(10)
-INFO=const(20)
-WARNING=const(30)
-ERROR=const(40)
-CRITICAL=const(50)
-_leveldict={DEBUG:('DEBUG','32'),INFO:('INFO','36'),WARNING:('WARNING','33'),ERROR:('ERROR','31'),CRITICAL:('CRITICAL','1;31')}
-level=DEBUG
-color=True
-def _log(name,mlevel,msg,*args):
-    if __debug__ and mlevel>=level:
-        msg=str(msg)
-        if color:fmt='%d \x1b[35m%s\x1b[0m \x1b['+_leveldict[mlevel][1]+'m%s\x1b[0m '+msg
-        else:fmt='%d %s %s '+msg
-        print(fmt%((utime.ticks_us(),name,_leveldict[mlevel][0])+args))
-def debug(name,msg,*args):_log(name,DEBUG,msg,*args)
-def info(name,msg,*args):_log(name,INFO,msg,*args)
-def warning(name,msg,*args):_log(name,WARNING,msg,*args)
-def error(name,msg,*args):_log(name,ERROR,msg,*args)
-def critical(name,msg,*args):_log(name,CRITICAL,msg,*args)
-def exception(name,exc):
-    if exc.__class__.__name__=='Result':_log(name,DEBUG,'ui.Result: %s',exc.value)
-    elif exc.__class__.__name__=='Cancelled':_log(name,DEBUG,'ui.Cancelled')
-    else:_log(name,ERROR,'exception:');sys.print_exception(exc)
\ No newline at end of file
+
+NOTSET = const(0)
+DEBUG = const(10)
+INFO = const(20)
+WARNING = const(30)
+ERROR = const(40)
+CRITICAL = const(50)
+_NAMES = {DEBUG: ('DEBUG', '32'), INFO: ('INFO', '36'), WARNING: ('WARNING', '33'),
+          ERROR: ('ERROR', '31'), CRITICAL: ('CRITICAL', '1;31')}
+
+RING = const(64)
+DRAIN_MS = const(50)
+_MAX_TAGS = const(64)
+
+level = DEBUG
+forward = INFO  # set before logging starts
+color = True
+dropped = 0
+
+_ticks = array('i', [0]) * RING
+_levels = bytearray(RING)
+_tags = bytearray(RING)
+_msgs = [None] * RING
+_args = [None] * RING
+_head = 0  # next slot
+_stored = 0  # records in the ring
+_pending = 0  # of them not printed yet
+_kept = 0  # of them at forward level or above
+_unsent = 0  # of those not sent by radio yet
+_tag_ids = {}
+_tag_names = []
+_tag_levels = bytearray(_MAX_TAGS)  # NOTSET follows level
+_ready = asyncio.ThreadSafeFlag()
+
+
+def _tag(name):
+    # id of a tag, new ones once; past _MAX_TAGS they share the last
+    tag = _tag_ids.get(name)
+    if tag is None:
+        tag = min(len(_tag_names), _MAX_TAGS - 1)
+        if tag == len(_tag_names):
+            _tag_names.append(name)
+        _tag_ids[name] = tag
+    return tag
+
+
+def set_level(name, mlevel):
+    # NOTSET to follow level again
+    _tag_levels[_tag(name)] = mlevel
+
+
+def _log(name, mlevel, msg, args):
+    global _head, _stored, _pending, _kept, _unsent, dropped
+    tag = _tag_ids.get(name)
+    if tag is None:
+        tag = _tag(name)
+    if mlevel < (_tag_levels[tag] or level):
+        return
+    i = _head
+    if _stored == RING and _levels[i] >= forward:
+        _kept -= 1
+        if _unsent > _kept:
+            _unsent = _kept
+    if mlevel >= forward:
+        _kept += 1
+        _unsent += 1
+    _ticks[i] = utime.ticks_us()
+    _levels[i] = mlevel
+    _tags[i] = tag
+    _msgs[i] = msg
+    _args[i] = args
+    _head = (i + 1) % RING
+    if _stored < RING:
+        _stored += 1
+    if _pending < RING:
+        _pending += 1
+    else:
+        dropped += 1
+    _ready.set()
+
+
+def debug(name, msg, *args):
+    if __debug__:
+        _log(name, DEBUG, msg, args)
+
+
+def info(name, msg, *args):
+    if __debug__:
+        _log(name, INFO, msg, args)
+
+
+def warning(name, msg, *args):
+    if __debug__:
+        _log(name, WARNING, msg, args)
+
+
+def error(name, msg, *args):
+    if __debug__:
+        _log(name, ERROR, msg, args)
+
+
+def critical(name, msg, *args):
+    if __debug__:
+        _log(name, CRITICAL, msg, args)
+
+
+def exception(name, exc):
+    if exc.__class__.__name__ == 'Result':
+        _log(name, DEBUG, 'ui.Result: %s', (exc.value,))
+    elif exc.__class__.__name__ == 'Cancelled':
+        _log(name, DEBUG, 'ui.Cancelled', ())
+    else:
+        _log(name, ERROR, 'exception:', ())
+        flush()
+        sys.print_exception(exc)
+
+
+def _message(i):
+    msg = str(_msgs[i])
+    args = _args[i]
+    if args:
+        try:
+            msg = msg % args
+        except (TypeError, ValueError):
+            msg = '%s %r' % (msg, args)
+    return msg
+
+
+def _format(i):
+    msg = _message(i)
+    mlevel, code = _NAMES.get(_levels[i], ('LEVEL %d' % _levels[i], '0'))
+    if color:
+        return '%d \x1b[35m%s\x1b[0m \x1b[%sm%s\x1b[0m %s' % (
+            _ticks[i], _tag_names[_tags[i]], code, mlevel, msg)
+    return '%d %s %s %s' % (_ticks[i], _tag_names[_tags[i]], mlevel, msg)
+
+
+def _emit():
+    # the oldest unprinted record
+    global _pending
+    i = (_head - _pending) % RING
+    _pending -= 1
+    print(_format(i))
+
+
+def flush():
+    # everything unprinted, right now
+    while _pending:
+        _emit()
+
+
+async def drain(period_ms=DRAIN_MS):
+    # prints in the background, yielding after every record
+    while True:
+        await _ready.wait()
+        while _pending:
+            _emit()
+            await asyncio.sleep_ms(0)
+        await asyncio.sleep_ms(period_ms)
+
+
+def unsent():
+    return _unsent
+
+
+def unsent_records():
+    # [(ticks_us, level, 'tag message')] not sent by radio yet, oldest first
+    records = []
+    k = 0
+    while len(records) < _unsent and k < _stored:
+        i = (_head - 1 - k) % RING
+        if _levels[i] >= forward:
+            records.append((_ticks[i], _levels[i], '%s %s' % (_tag_names[_tags[i]], _message(i))))
+        k += 1
+    records.reverse()
+    return records
+
+
+def sent(n):
+    # the n oldest of unsent_records() went out
+    global _unsent
+    _unsent = max(0, _unsent - n)
+
+
+def dump(name=None):
+    # the whole ring again, or only one tag's records
+    tag = None if name is None else _tag_ids.get(name, -1)
+    for k in range(_stored):
+        i = (_head - _stored + k) % RING
+        if tag is None or _tags[i] == tag:
+            print(_format(i))
+    print('records: %d, unprinted: %d, dropped: %d' % (_stored, _pending, dropped))
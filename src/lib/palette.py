@@ -0,0 +1,45 @@
+# palette.py Precompiled palette lookup tables for the LED strip
+
+# Colors are resolved once per palette/brightness change through the
+# integer pipeline in fancyfixed (interpolation, gamma, brightness) and
+# stored as raw GRB bytes in the layout used by NeoPixel(..., bpp=3).
+# Rendering a frame is then only indexing and copying bytes.
+
+from array import array
+from micropython import const
+
+import fancyfixed
+import pixelops
+
+LUT_BITS = const(9)  # 512 entries per palette cycle
+PHASE_BITS = const(16)
+PHASE_ONE = const(0x10000)  # one full palette cycle in phase units
+PHASE_MASK = const(0xFFFF)
+
+
+class CompiledPalette:
+    def __init__(self, bits=LUT_BITS):
+        self.size = 1 << bits
+        self.shift = PHASE_BITS - bits
+        self.lut = bytearray(self.size * 3)
+        self.palette = None
+        self.brightness = None
+        self._packed = {}
+
+    def compile(self, palette, brightness):
+        # returns True when the table had to be rebuilt
+        if palette is self.palette and brightness == self.brightness:
+            return False
+        # CRGB palettes are converted once and kept
+        packed_palette = self._packed.get(id(palette))
+        if packed_palette is None:
+            packed_palette = self._packed[id(palette)] = array('I', fancyfixed.from_crgb(palette))
+        bright = fancyfixed.clamp(int(brightness * fancyfixed.ONE), 0, fancyfixed.ONE)
+        pixelops.compile_lut(self.lut, packed_palette, fancyfixed.GAMMA, bright, self.shift, self.size)
+        self.palette = palette
+        self.brightness = brightness
+        return True
+
+    def render(self, buf, phase, step, num):
+        # phase and step are in PHASE_ONE units, buf is the neopixel buffer
+        pixelops.fill_lut(buf, self.lut, phase, step, num, self.shift)
@@ -0,0 +1,47 @@
+# pixelops.py Inner loops of the strip renderer
+
+# Plain Python reference versions live here. When the viper emitter is
+# available they are replaced by the versions in pixelops_viper, on ports
+# without it (or CPython on the host) the fallbacks are used as they are.
+# Both produce byte identical output.
+
+ACCELERATED = False
+
+
+def fill_lut(buf, lut, phase, step, num, shift):
+    # copy num GRB pixels from lut into buf, pixel i sits at phase + i * step
+    j = 0
+    for i in range(num):
+        k = (((phase + i * step) & 0xFFFF) >> shift) * 3
+        buf[j] = lut[k]
+        buf[j + 1] = lut[k + 1]
+        buf[j + 2] = lut[k + 2]
+        j += 3
+
+
+def compile_lut(lut, palette, gamma, bright, shift, size):
+    # palette_lookup + gamma_adjust for size positions, see fancyfixed
+    n = len(palette)
+    j = 0
+    for k in range(size):
+        w = (k << shift) * n
+        idx = w >> 16
+        color1 = palette[idx]
+        color2 = palette[idx + 1 if idx + 1 < n else 0]
+        weight2 = (w & 0xFFFF) >> 8
+        weight1 = 256 - weight2
+        r = (((color1 >> 16) & 0xFF) * weight1 + ((color2 >> 16) & 0xFF) * weight2) >> 8
+        g = (((color1 >> 8) & 0xFF) * weight1 + ((color2 >> 8) & 0xFF) * weight2) >> 8
+        b = ((color1 & 0xFF) * weight1 + (color2 & 0xFF) * weight2) >> 8
+        lut[j] = (gamma[g] * bright) >> 8
+        lut[j + 1] = (gamma[r] * bright) >> 8
+        lut[j + 2] = (gamma[b] * bright) >> 8
+        j += 3
+
+
+try:
+    from pixelops_viper import fill_lut, compile_lut
+    ACCELERATED = True
+except (ImportError, SyntaxError, AttributeError, NameError):
+    # no viper emitter on this port
+    pass
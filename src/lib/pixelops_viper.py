@@ -0,0 +1,46 @@
+# pixelops_viper.py Viper versions of pixelops, import through pixelops
+
+# Compiling this module fails with SyntaxError where the viper emitter is
+# not available, pixelops then keeps its plain Python versions.
+
+import micropython
+
+
+@micropython.viper
+def fill_lut(buf, lut, phase: int, step: int, num: int, shift: int):
+    dst = ptr8(buf)
+    src = ptr8(lut)
+    j = 0
+    for i in range(num):
+        k = (((phase + i * step) & 0xFFFF) >> shift) * 3
+        dst[j] = src[k]
+        dst[j + 1] = src[k + 1]
+        dst[j + 2] = src[k + 2]
+        j += 3
+
+
+@micropython.viper
+def compile_lut(lut, palette, gamma, bright: int, shift: int, size: int):
+    # palette is an array('I') of packed colors
+    dst = ptr8(lut)
+    pal = ptr32(palette)
+    gam = ptr8(gamma)
+    n = int(len(palette))
+    j = 0
+    for k in range(size):
+        w = (k << shift) * n
+        idx = w >> 16
+        color1 = pal[idx]
+        idx += 1
+        if idx >= n:
+            idx = 0
+        color2 = pal[idx]
+        weight2 = (w & 0xFFFF) >> 8
+        weight1 = 256 - weight2
+        r = (((color1 >> 16) & 0xFF) * weight1 + ((color2 >> 16) & 0xFF) * weight2) >> 8
+        g = (((color1 >> 8) & 0xFF) * weight1 + ((color2 >> 8) & 0xFF) * weight2) >> 8
+        b = ((color1 & 0xFF) * weight1 + (color2 & 0xFF) * weight2) >> 8
+        dst[j] = (gam[g] * bright) >> 8
+        dst[j + 1] = (gam[r] * bright) >> 8
+        dst[j + 2] = (gam[b] * bright) >> 8
+        j += 3
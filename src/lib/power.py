@@ -0,0 +1,84 @@
+# power.py Sleep through rest, wake up on motion
+
+# wait_idle() returns once the BMI160 has reported no motion for idle_ms.
+# sleep() then puts the IMU into its any-motion mode and naps in
+# machine.lightsleep() with INT1, and optionally buttons, as wake sources,
+# which costs a fraction of a running CPU and strip. Naps that end on the
+# timer add up; after deep_ms of them the collar goes to deepsleep, which
+# only motion or a button ends, through a reset. Whatever should survive
+# that goes into RTC memory with save() and comes back from restore().
+
+import struct
+
+import esp32
+import machine
+import uasyncio as asyncio
+import utime
+from micropython import const
+
+IDLE_MS = const(30000)
+NAP_MS = const(60000)
+DEEP_MS = const(600000)
+_CHECK_MS = const(1000)
+_MAGIC = b'DSpm'
+
+
+class PowerManager:
+    def __init__(self, imu, buttons=(), idle_ms=IDLE_MS, nap_ms=NAP_MS, deep_ms=DEEP_MS):
+        # imu is an ImuFifo, buttons are pins that read low when pressed
+        self.imu = imu
+        self.buttons = buttons
+        self.idle_ms = idle_ms
+        self.nap_ms = nap_ms
+        self.deep_ms = deep_ms
+        self.sleeping = False
+        self.naps = 0
+        self.wakes = 0
+        self.woke_from_deepsleep = machine.reset_cause() == machine.DEEPSLEEP_RESET
+
+    def save(self, fmt, *values):
+        machine.RTC().memory(_MAGIC + struct.pack(fmt, *values))
+
+    def restore(self, fmt):
+        # the values given to save() if this boot is a wake from deepsleep
+        if not self.woke_from_deepsleep:
+            return None
+        data = machine.RTC().memory()
+        if data[:len(_MAGIC)] != _MAGIC or len(data) != len(_MAGIC) + struct.calcsize(fmt):
+            return None
+        return struct.unpack(fmt, data[len(_MAGIC):])
+
+    async def wait_idle(self):
+        still_since = None
+        while True:
+            await asyncio.sleep_ms(_CHECK_MS)
+            if not self.imu.zero_motion:
+                still_since = None
+            elif still_since is None:
+                still_since = utime.ticks_ms()
+            elif utime.ticks_diff(utime.ticks_ms(), still_since) >= self.idle_ms:
+                return
+
+    async def sleep(self):
+        # returns the wake reason, unless it ends up in deepsleep
+        await self.imu.suspend()
+        esp32.wake_on_ext0(pin=self.imu.pin, level=esp32.WAKEUP_ANY_HIGH)
+        if self.buttons:
+            esp32.wake_on_ext1(pins=self.buttons, level=esp32.WAKEUP_ALL_LOW)
+        self.sleeping = True
+        napped = 0
+        while True:
+            machine.lightsleep(self.nap_ms)
+            reason = machine.wake_reason()
+            if reason != machine.TIMER_WAKE:
+                break
+            self.naps += 1
+            napped += self.nap_ms
+            if napped >= self.deep_ms:
+                machine.deepsleep()
+            # other tasks get a look in between, e.g. the battery
+            await asyncio.sleep_ms(0)
+        self.sleeping = False
+        self.wakes += 1
+        await self.imu.resume()
+        return reason
@@ -0,0 +1,179 @@
+# protocol.py Telemetry wire format, shared by the collar and collector.py
+
+# v6, one sample per datagram, '12sHI4f8f' in native layout (68 bytes):
+#   uid, version, ticks_us, vbat V, charge %, IMU temperature C, fps,
+#   accel xyz g, gyro xyz deg/s, pitch, roll deg
+#
+# v7, count samples per datagram, little endian:
+#   header '<12sHBBHII': uid, version, schema, count, sequence number,
+#   ticks_us of the first sample, us between samples
+#   status fields, int16 each
+#   count samples of sample fields, int16 each
+# The schema id says which fields there are and the scale that turns each
+# raw value into units.
+#
+# v8 carries log records as text, little endian:
+#   header '<12sHHH': uid, version, sequence number, count
+#   count lines of '<iBB' ticks_us, level, length, then that many bytes
+#   of "tag message" in UTF-8, cut at 255 or where the datagram ends
+# The version is at the same offset in all of them, so a receiver can
+# tell them apart from the first 14 bytes.
+#
+# The flash log of flashlog.py, read back by dumplog.py, is a small
+# index file and a ring of segment files of LOG_BLOCK byte blocks, little
+# endian. The index is '<4sHHHHHIH': magic, version, block size, blocks
+# per segment, segments, record size, number of the newest segment,
+# session. Segment n is in file n % segments. Each block starts with
+# '<4sIHH': magic, segment number, session, records; then the records,
+# '<i' ms since the session started and the LOG_FIELDS as int16.
+#
+# Runs on MicroPython and CPython.
+
+import struct
+
+V6 = 6
+V7 = 7
+V_TEXT = 8
+VERSION = V7
+VERSIONS = (V6, V7, V_TEXT)
+VERSION_OFFSET = 12
+
+V6_FORMAT = '12sHI4f8f'
+V6_SIZE = struct.calcsize(V6_FORMAT)
+HEADER_FORMAT = '<12sHBBHII'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+TICKS_PERIOD = 1 << 30  # MicroPython ticks_us wrap
+TEXT_HEADER_FORMAT = '<12sHHH'
+TEXT_HEADER_SIZE = struct.calcsize(TEXT_HEADER_FORMAT)
+TEXT_LINE_FORMAT = '<iBB'
+TEXT_LINE_SIZE = struct.calcsize(TEXT_LINE_FORMAT)
+
+SCHEMA_IMU = 1
+# schema id: ((status field, scale), ...), ((sample field, scale), ...)
+SCHEMAS = {
+    SCHEMA_IMU: (
+        (('vbat', 0.001), ('soc', 0.1), ('temperature', 0.01), ('fps', 1)),
+        (('ax', 1 / 8192), ('ay', 1 / 8192), ('az', 1 / 8192),
+         ('gx', 1 / 131), ('gy', 1 / 131), ('gz', 1 / 131),
+         ('pitch', 0.01), ('roll', 0.01)),
+    ),
+}
+
+LOG_MAGIC = b'DSlg'
+LOG_BLOCK_MAGIC = b'DSlb'
+LOG_VERSION = 2
+LOG_BLOCK = 4096
+LOG_INDEX_FORMAT = '<4sHHHHHIH'
+LOG_INDEX_SIZE = struct.calcsize(LOG_INDEX_FORMAT)
+LOG_BLOCK_FORMAT = '<4sIHH'
+LOG_BLOCK_SIZE = struct.calcsize(LOG_BLOCK_FORMAT)
+# (field, scale) like SCHEMAS
+LOG_FIELDS = (
+    ('ax', 1 / 8192), ('ay', 1 / 8192), ('az', 1 / 8192), ('pitch', 0.01), ('roll', 0.01),
+    ('activity', 1), ('speed', 1), ('gait', 1), ('vbat', 0.001), ('soc', 0.1),
+)
+LOG_RECORD_FORMAT = '<i%dh' % len(LOG_FIELDS)
+LOG_RECORD_SIZE = struct.calcsize(LOG_RECORD_FORMAT)
+
+
+def formats(schema=SCHEMA_IMU):
+    # (status format, sample format) for pack_into on a v7 datagram
+    status, sample = SCHEMAS[schema]
+    return '<%dh' % len(status), '<%dh' % len(sample)
+
+
+def size(version=VERSION, schema=SCHEMA_IMU, count=1):
+    if version == V6:
+        return V6_SIZE
+    status, sample = SCHEMAS[schema]
+    return HEADER_SIZE + 2 * len(status) + 2 * len(sample) * count
+
+
+def max_count(max_size, schema=SCHEMA_IMU):
+    # most samples in a v7 datagram of at most max_size bytes
+    status, sample = SCHEMAS[schema]
+    return max(1, (max_size - HEADER_SIZE - 2 * len(status)) // (2 * len(sample)))
+
+
+def sample_offset(schema, index):
+    status, sample = SCHEMAS[schema]
+    return HEADER_SIZE + 2 * len(status) + 2 * len(sample) * index
+
+
+def pack_header(buf, uid, schema, count, seq, ticks, interval_us):
+    struct.pack_into(HEADER_FORMAT, buf, 0, uid, V7, schema, count, seq, ticks, interval_us)
+
+
+def pack_v6(buf, uid, ticks, status, sample, schema=SCHEMA_IMU):
+    # status and sample are raw values as in v7
+    status_fields, sample_fields = SCHEMAS[schema]
+    struct.pack_into(
+        V6_FORMAT, buf, 0, uid, V6, ticks,
+        *([status[i] * f[1] for i, f in enumerate(status_fields)]
+          + [sample[i] * f[1] for i, f in enumerate(sample_fields)]))
+
+
+def pack_text_header(buf, uid, seq, count):
+    struct.pack_into(TEXT_HEADER_FORMAT, buf, 0, uid, V_TEXT, seq, count)
+
+
+def pack_text_line(buf, offset, ticks, level, text, cut=False):
+    # offset after the line, or None if it doesn't fit; with cut, text
+    # that doesn't fit is cut short instead
+    room = len(buf) - offset - TEXT_LINE_SIZE
+    text = text.encode()
+    n = min(len(text), 255)
+    if n > room:
+        if not cut or room <= 0:
+            return None
+        n = room
+    struct.pack_into(TEXT_LINE_FORMAT, buf, offset, ticks, level, n)
+    offset += TEXT_LINE_SIZE
+    buf[offset:offset + n] = text[:n]
+    return offset + n
+
+
+def version(packet):
+    return struct.unpack_from('<H', packet, VERSION_OFFSET)[0]
+
+
+def decode(packet):
+    # dict with uid, version, schema, seq, status {name: value} and
+    # samples [(ticks_us, {name: value}), ...], values in units; for v8
+    # uid, version, seq and lines [(ticks_us, level, text), ...]
+    ver = version(packet)
+    if ver == V6:
+        values = struct.unpack(V6_FORMAT, packet[:V6_SIZE])
+        status_fields, sample_fields = SCHEMAS[SCHEMA_IMU]
+        return {
+            'uid': values[0].decode(), 'version': V6, 'schema': SCHEMA_IMU, 'seq': None,
+            'status': {f[0]: v for f, v in zip(status_fields, values[3:7])},
+            'samples': [(values[2], {f[0]: v for f, v in zip(sample_fields, values[7:15])})],
+        }
+    if ver == V_TEXT:
+        uid, _, seq, count = struct.unpack_from(TEXT_HEADER_FORMAT, packet, 0)
+        lines = []
+        offset = TEXT_HEADER_SIZE
+        for _ in range(count):
+            ticks, level, n = struct.unpack_from(TEXT_LINE_FORMAT, packet, offset)
+            offset += TEXT_LINE_SIZE
+            lines.append((ticks, level, bytes(packet[offset:offset + n]).decode('utf-8', 'replace')))
+            offset += n
+        return {'uid': uid.decode(), 'version': V_TEXT, 'seq': seq, 'lines': lines}
+    if ver != V7:
+        raise ValueError('unknown protocol version %d' % ver)
+    uid, _, schema, count, seq, ticks, interval_us = struct.unpack_from(HEADER_FORMAT, packet, 0)
+    status_fields, sample_fields = SCHEMAS[schema]
+    status_format, sample_format = formats(schema)
+    status = struct.unpack_from(status_format, packet, HEADER_SIZE)
+    samples = []
+    for i in range(count):
+        values = struct.unpack_from(sample_format, packet, sample_offset(schema, i))
+        samples.append((
+            (ticks + i * interval_us) % TICKS_PERIOD,
+            {f[0]: v * f[1] for f, v in zip(sample_fields, values)}))
+    return {
+        'uid': uid.decode(), 'version': V7, 'schema': schema, 'seq': seq,
+        'status': {f[0]: v * f[1] for f, v in zip(status_fields, status)},
+        'samples': samples,
+    }
@@ -0,0 +1,109 @@
+# radio.py Keep WiFi off between bursts
+
+# Staying associated costs the collar more than the LEDs at low power.
+# The scheduler leaves the WLAN interface off while sources buffer in RAM
+# and brings it up every every_ms, or earlier once any source holds
+# high_water of its capacity: connect (the fast path of wifi_manager.py
+# without a scan), flush every source, radio off again. The link is the
+# WifiManager, or for ESP-NOW the transport itself, anything with async
+# connect() and down().
+#
+# A source has pending(), capacity and async flush() returning False when
+# sending failed; Telemetry and LogLines in telemetry.py are two. If the
+# network can't be had the next burst is put off twice as long each time,
+# up to BACKOFF_MAX_MS, and the sources keep their newest data meanwhile.
+#
+# on_ms adds up the time the radio was on, hour_ms within the current
+# hour of uptime and last_hour_ms the hour before that; on_per_hour()
+# is the average over the uptime.
+
+import uasyncio as asyncio
+import utime
+from micropython import const
+
+import log
+
+EVERY_MS = const(60000)
+HIGH_WATER = 0.75  # of a source's capacity
+BACKOFF_MAX_MS = const(600000)
+_CHECK_MS = const(1000)
+_HOUR_MS = const(3600000)
+
+
+class RadioScheduler:
+    def __init__(self, link, sources, every_ms=EVERY_MS, high_water=HIGH_WATER):
+        self.link = link
+        self.sources = sources
+        self.every_ms = every_ms
+        self.high_water = high_water
+        self.bursts = 0
+        self.failures = 0
+        self.on_ms = 0
+        self.hour_ms = 0
+        self.last_hour_ms = 0
+        self.hours = 0
+        self._hour_at = utime.ticks_ms()
+        self._wait_ms = every_ms
+
+    def _full(self):
+        for source in self.sources:
+            if source.pending() >= source.capacity * self.high_water:
+                return True
+        return False
+
+    def _roll(self):
+        now = utime.ticks_ms()
+        while utime.ticks_diff(now, self._hour_at) >= _HOUR_MS:
+            self._hour_at = utime.ticks_add(self._hour_at, _HOUR_MS)
+            self.last_hour_ms = self.hour_ms
+            self.hour_ms = 0
+            self.hours += 1
+
+    def on_per_hour(self):
+        # ms of radio on time per hour, over the whole uptime
+        self._roll()
+        up = self.hours * _HOUR_MS + utime.ticks_diff(utime.ticks_ms(), self._hour_at)
+        return self.on_ms * _HOUR_MS // max(up, 1)
+
+    async def burst(self):
+        # True if every source got everything out
+        start = utime.ticks_ms()
+        done = False
+        try:
+            if await self.link.connect():
+                done = True
+                for source in self.sources:
+                    if source.pending() and not await source.flush():
+                        done = False
+        finally:
+            self.link.down()
+            ms = utime.ticks_diff(utime.ticks_ms(), start)
+            self._roll()
+            self.on_ms += ms
+            self.hour_ms += ms
+        self.bursts += 1
+        if not done:
+            self.failures += 1
+        log.debug('radio', 'burst %s in %dms, on %dms this hour',
+                  'done' if done else 'failed', ms, self.hour_ms)
+        return done
+
+    async def run(self):
+        self.link.down()
+        since = utime.ticks_ms()
+        while True:
+            await asyncio.sleep_ms(_CHECK_MS)
+            self._roll()
+            due = utime.ticks_diff(utime.ticks_ms(), since) >= self._wait_ms
+            # while backing off a full buffer has to wait too
+            if not due and (self._wait_ms > self.every_ms or not self._full()):
+                continue
+            if not any(source.pending() for source in self.sources):
+                since = utime.ticks_ms()
+                continue
+            if await self.burst():
+                self._wait_ms = self.every_ms
+            else:
+                self._wait_ms = min(self._wait_ms * 2, BACKOFF_MAX_MS)
+                log.info('radio', 'no network, next burst in %dms', self._wait_ms)
+            since = utime.ticks_ms()
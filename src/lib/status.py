@@ -0,0 +1,130 @@
+# status.py Collar status as a state machine on hfsm
+
+# States are charging, full, normal, low, critical and sleeping. The fuel
+# gauge is reduced to a level (one of the first five, with hysteresis)
+# and only a change of level becomes an event, so nothing happens while
+# the battery just sits at a level. The long press moves between normal
+# and low by hand, sleep() and wake() come from the power manager. The
+# manual low is kept in manual_low so wake() goes back to it, and a change
+# of battery level overrides it.
+#
+# Each state brings its board LED color, blink interval and whether low
+# power is on; on_change gets called with the Status after every entry.
+
+from micropython import const
+
+from hfsm import Event, State, StateMachine
+
+CHARGING = 'charging'
+FULL = 'full'
+NORMAL = 'normal'
+LOW = 'low'
+CRITICAL = 'critical'
+SLEEPING = 'sleeping'
+LEVELS = (CHARGING, FULL, NORMAL, LOW, CRITICAL)
+
+# permille of charge
+SOC_FULL = const(980)
+SOC_LOW_ON = const(150)
+SOC_LOW_OFF = const(250)
+SOC_CRITICAL_ON = const(50)
+SOC_CRITICAL_OFF = const(100)
+
+# board LED color, blink interval ms, low power
+LOOK = {
+    CHARGING: ((0, 0, 10, 0), 1000, False),
+    FULL: ((0, 10, 0, 0), 3000, False),
+    NORMAL: ((0, 10, 0, 0), 1500, False),
+    LOW: ((10, 0, 0, 0), 750, True),
+    CRITICAL: ((10, 0, 5, 0), 500, True),
+    SLEEPING: (None, 1000, True),
+}
+
+_BUTTON = 'button'
+_SLEEP = 'sleep'
+_WAKE = 'wake'
+
+
+def level(soc, charging, present, current=NORMAL):
+    # current is the previous level, for the hysteresis
+    if charging or not present:
+        return FULL if present and soc >= SOC_FULL else CHARGING
+    if soc <= SOC_CRITICAL_ON or (current == CRITICAL and soc < SOC_CRITICAL_OFF):
+        return CRITICAL
+    if soc <= SOC_LOW_ON or (current in (LOW, CRITICAL) and soc < SOC_LOW_OFF):
+        return LOW
+    return NORMAL
+
+
+class Status:
+    def __init__(self):
+        self.name = None
+        self.level = NORMAL
+        self.color = None
+        self.interval = 1000
+        self.low_power = False
+        self.manual_low = False
+        self.on_change = None
+        self._valid = set()  # (state, event) with a transition
+        sm = self._sm = StateMachine('status')
+        states = {}
+        for name in LEVELS + (SLEEPING,):
+            state = states[name] = State(name)
+            state.on_entry(self._entered(name))
+            sm.add_state(state, initial_state=name == NORMAL)
+        events = {}
+        for name in LEVELS + (_BUTTON, _SLEEP, _WAKE):
+            event = events[name] = Event(name)
+            sm.add_event(event)
+
+        def add(src, dst, event):
+            sm.add_transition(states[src], states[dst], events[event])
+            self._valid.add((src, event))
+
+        for src in LEVELS:
+            for dst in LEVELS:
+                if src != dst:
+                    add(src, dst, dst)
+            add(src, SLEEPING, _SLEEP)
+        add(NORMAL, LOW, _BUTTON)
+        add(LOW, NORMAL, _BUTTON)
+        add(SLEEPING, NORMAL, _WAKE)
+        self._events = events
+
+    def _entered(self, name):
+        def entered(data):
+            self.name = name
+            self.color, self.interval, self.low_power = LOOK[name]
+            if self.on_change is not None:
+                self.on_change(self)
+        return entered
+
+    def _trigger(self, event):
+        if (self.name, event) in self._valid:
+            self._sm.trigger_event(self._events[event])
+
+    def start(self, on_change=None):
+        self.on_change = on_change
+        self._sm.start(None)
+
+    def battery(self, soc, charging, present):
+        new = level(soc, charging, present, self.level)
+        if new != self.level:
+            self.level = new
+            self.manual_low = False
+            self._trigger(new)
+
+    def button(self):
+        if (self.name, _BUTTON) in self._valid:
+            self.manual_low = self.name == NORMAL
+        self._trigger(_BUTTON)
+
+    def sleep(self):
+        self._trigger(_SLEEP)
+
+    def wake(self):
+        self._trigger(_WAKE)
+        if self.level != NORMAL:
+            self._trigger(self.level)
+        elif self.manual_low:
+            self._trigger(_BUTTON)
@@ -0,0 +1,190 @@
+# telemetry.py Telemetry in the formats of protocol.py
+
+# sample() takes raw IMU frames as they come out of the FIFO, keeps every
+# every-th and packs it with pack_into straight into the datagram being
+# filled: batch samples per v7 datagram, or one v6 datagram per sample
+# for old collectors. status() sets the per datagram fields.
+#
+# Finished datagrams sit in a ring of preallocated slots. When the sender
+# falls behind, e.g. without a network, the oldest one gets overwritten,
+# so sample() never waits. run() hands them to the transport (UDP,
+# ESP-NOW, see transport.py) and backs off after errors; or radio.py
+# calls flush() when the radio is up.
+#
+# LogLines is the other radio.py source: the log records log.py keeps for
+# the radio, as many lines per v8 datagram as fit.
+
+import struct
+from array import array
+
+import uasyncio as asyncio
+import utime
+from micropython import const
+
+import log
+import protocol
+
+QUEUE = const(8)
+BATCH = const(8)
+_BACKOFF_MIN_MS = const(250)
+_BACKOFF_MAX_MS = const(8000)
+
+
+class Telemetry:
+    def __init__(self, uid, transport, version=protocol.VERSION, schema=protocol.SCHEMA_IMU,
+                 batch=BATCH, every=1, sample_us=20000, queue=QUEUE):
+        self.uid = uid
+        self.transport = transport  # see transport.py
+        self.version = version
+        self.schema = schema
+        self.batch = 1
+        if version >= protocol.V7:
+            self.batch = min(batch, protocol.max_count(transport.max_size, schema))
+        self.every = every
+        self.sample_us = sample_us
+        self.interval_us = sample_us * every
+        self._status_format, self._sample_format = protocol.formats(schema)
+        self._status = array('h', [0]) * len(protocol.SCHEMAS[schema][0])
+        self._offsets = [protocol.sample_offset(schema, i) for i in range(self.batch)]
+        size = protocol.size(version, schema, self.batch)
+        self._slots = [bytearray(size) for _ in range(queue)]
+        self.capacity = queue
+        self._head = 0  # oldest unsent
+        self._count = 0
+        self._fill = 0  # samples in the slot after the last unsent one
+        self._ticks = 0  # of its first sample
+        self._skip = 0
+        self._seq = 0
+        self._ready = asyncio.Event()
+        self.sent = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def status(self, vbat_mv, soc, temperature_cc, fps):
+        # raw as in protocol.SCHEMAS: mV, permille, 1/100 C, fps
+        status = self._status
+        status[0] = vbat_mv
+        status[1] = soc
+        status[2] = temperature_cc
+        status[3] = fps
+
+    def sample(self, ticks, ax, ay, az, gx, gy, gz, pitch, roll):
+        # raw accel and gyro, pitch and roll in 1/100 deg
+        if self._skip:
+            self._skip -= 1
+            return
+        self._skip = self.every - 1
+        slots = self._slots
+        if self._fill == 0:
+            if self._count == len(slots):
+                # full, the oldest one goes
+                self._head = (self._head + 1) % len(slots)
+                self._count -= 1
+                self.dropped += 1
+            self._ticks = ticks
+        slot = slots[(self._head + self._count) % len(slots)]
+        if self.version == protocol.V6:
+            protocol.pack_v6(slot, self.uid, ticks, self._status,
+                             (ax, ay, az, gx, gy, gz, pitch, roll), self.schema)
+        else:
+            struct.pack_into(self._sample_format, slot, self._offsets[self._fill],
+                             ax, ay, az, gx, gy, gz, pitch, roll)
+            self._fill += 1
+            if self._fill < self.batch:
+                return
+            self._fill = 0
+            protocol.pack_header(slot, self.uid, self.schema, self.batch, self._seq,
+                                 self._ticks, self.interval_us)
+            struct.pack_into(self._status_format, slot, protocol.HEADER_SIZE, *self._status)
+        self._seq = (self._seq + 1) & 0xFFFF
+        self._count += 1
+        self._ready.set()
+
+    def frames(self, samples, n, stride, pitch, roll):
+        # n FIFO frames (gyro xyz, accel xyz), the last one taken just now
+        now = utime.ticks_us()
+        for k in range(n):
+            i = k * stride
+            self.sample(utime.ticks_add(now, (k + 1 - n) * self.sample_us),
+                        samples[i + 3], samples[i + 4], samples[i + 5],
+                        samples[i], samples[i + 1], samples[i + 2], pitch, roll)
+
+    def pending(self):
+        # finished datagrams waiting to be sent
+        return self._count
+
+    def _send(self):
+        # the oldest one, False if it didn't go out
+        if not self.transport.send(self._slots[self._head]):
+            # no network or no buffers, the ring keeps the newest
+            self.errors += 1
+            return False
+        self._head = (self._head + 1) % len(self._slots)
+        self._count -= 1
+        self.sent += 1
+        return True
+
+    async def flush(self):
+        # everything queued in one go, for radio.py; False on an error
+        self.transport.open()
+        while self._count:
+            if not self._send():
+                return False
+            await asyncio.sleep_ms(0)
+        return True
+
+    async def run(self):
+        # send as they come, while the radio stays on
+        self.transport.open()
+        backoff = 0
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            while self._count:
+                if not self._send():
+                    backoff = min(backoff * 2 or _BACKOFF_MIN_MS, _BACKOFF_MAX_MS)
+                    await asyncio.sleep_ms(backoff)
+                    continue
+                backoff = 0
+                await asyncio.sleep_ms(0)
+
+
+class LogLines:
+    def __init__(self, uid, transport):
+        self.uid = uid
+        self.transport = transport
+        self.capacity = log.RING
+        self._buf = bytearray(transport.max_size)
+        self._seq = 0
+        self.sent = 0
+        self.errors = 0
+
+    def pending(self):
+        return log.unsent()
+
+    async def flush(self):
+        # everything unsent, for radio.py; False on an error
+        self.transport.open()
+        buf = self._buf
+        records = log.unsent_records()
+        i = 0
+        while i < len(records):
+            offset = protocol.TEXT_HEADER_SIZE
+            n = 0
+            for ticks, level, text in records[i:]:
+                # only a line alone in a datagram gets cut short
+                end = protocol.pack_text_line(buf, offset, ticks, level, text, n == 0)
+                if end is None:
+                    break
+                offset = end
+                n += 1
+            protocol.pack_text_header(buf, self.uid, self._seq, n)
+            if not self.transport.send(memoryview(buf)[:offset]):
+                self.errors += 1
+                return False
+            log.sent(n)
+            self._seq = (self._seq + 1) & 0xFFFF
+            self.sent += 1
+            i += n
+            await asyncio.sleep_ms(0)
+        return True
@@ -0,0 +1,214 @@
+# transport.py Ways for telemetry datagrams to leave the collar
+
+# Every transport has open(), send(buf) returning False when the datagram
+# didn't go out, and close(); needs_wifi says whether it only works while
+# the station is associated, max_size how long a datagram may be.
+# Receivers also have async recv() returning (mac, msg).
+#
+#   UdpTransport     datagrams to the collector, multicast by default;
+#                    needs association and DHCP first
+#   EspNowTransport  ESP-NOW frames, connectionless, to a gateway board
+#                    on the same channel, which bridges them to UDP
+#   LocalTransport   stand-in for ESP-NOW on Linux: frames go to a UDP
+#                    port on 127.0.0.1 as the sender's mac plus msg
+#
+# The datagram is the same in all of them, so Bridge only checks it and
+# passes it on; collector.py can't tell how it came. An ESP-NOW frame
+# carries at most ESPNOW_MAX bytes, a v7 batch of up to 13 samples.
+#
+# create() builds one from the stream.json keys: "transport" ("udp",
+# "espnow" or "local"), "host" and "port" for udp, "peer" (hex mac,
+# broadcast by default) and "channel" for espnow, "local_port" for local.
+
+import errno
+import socket
+
+import network
+import ubinascii
+import uasyncio as asyncio
+from micropython import const
+
+import log
+import protocol
+
+UDP = 'udp'
+ESPNOW = 'espnow'
+LOCAL = 'local'
+
+ESPNOW_MAX = const(250)
+UDP_MAX = const(1472)  # without fragmenting on a 1500 byte MTU
+BROADCAST = b'\xff' * 6
+LOCAL_PORT = const(2324)
+_POLL_MS = const(10)
+
+
+class UdpTransport:
+    needs_wifi = True
+    max_size = UDP_MAX
+
+    def __init__(self, host, port):
+        self.addr = socket.getaddrinfo(host, port)[0][-1]
+        self._sock = None
+
+    def open(self):
+        if self._sock is None:
+            self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._sock.setblocking(False)
+
+    def send(self, buf):
+        try:
+            self._sock.sendto(buf, self.addr)
+            return True
+        except OSError:
+            return False
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+
+class EspNowTransport:
+    # the station interface has to be up, not connected; connect() and
+    # down() let radio.py switch it like the WifiManager
+    needs_wifi = False
+    max_size = ESPNOW_MAX
+
+    def __init__(self, peer=BROADCAST, channel=None):
+        self.peer = peer
+        self.channel = channel
+        self.wlan = network.WLAN(network.STA_IF)
+        self._espnow = None
+
+    def open(self):
+        if self._espnow is not None:
+            return
+        import aioespnow  # only in builds with ESP-NOW
+
+        self.wlan.active(True)
+        if self.channel and not self.wlan.isconnected():
+            # a gateway receives on the channel of its access point
+            try:
+                self.wlan.config(channel=self.channel)
+            except (OSError, ValueError):
+                log.warning('espnow', 'could not set channel %d', self.channel)
+        self._espnow = aioespnow.AIOESPNow()
+        self._espnow.active(True)
+        try:
+            self._espnow.add_peer(self.peer)
+        except OSError:
+            pass  # already known
+
+    def send(self, buf):
+        try:
+            # no waiting for the ack, broadcasts don't get one anyway
+            return self._espnow.send(self.peer, buf, False)
+        except OSError:
+            return False
+
+    async def recv(self):
+        return await self._espnow.arecv()
+
+    def close(self):
+        if self._espnow is not None:
+            self._espnow.active(False)
+            self._espnow = None
+
+    async def connect(self):
+        self.open()
+        return True
+
+    def down(self):
+        self.close()
+        self.wlan.active(False)
+
+
+class LocalTransport:
+    needs_wifi = False
+    max_size = ESPNOW_MAX
+
+    def __init__(self, port=LOCAL_PORT, mac=None):
+        self.addr = socket.getaddrinfo('127.0.0.1', port)[0][-1]
+        self.mac = mac or network.WLAN(network.STA_IF).config('mac') or BROADCAST
+        self._sock = None
+        self._bound = False
+
+    def open(self):
+        if self._sock is None:
+            self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._sock.setblocking(False)
+
+    def send(self, buf):
+        try:
+            self._sock.sendto(self.mac + buf, self.addr)
+            return True
+        except OSError:
+            return False
+
+    async def recv(self):
+        if not self._bound:
+            self._sock.bind(self.addr)
+            self._bound = True
+        while True:
+            try:
+                frame = self._sock.recv(ESPNOW_MAX + 6)
+                return frame[:6], frame[6:]
+            except OSError as e:
+                if e.args[0] != errno.EAGAIN:
+                    raise
+            await asyncio.sleep_ms(_POLL_MS)
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+            self._bound = False
+
+    async def connect(self):
+        self.open()
+        return True
+
+    def down(self):
+        pass
+
+
+def create(config):
+    kind = config.get('transport', UDP)
+    if kind == UDP:
+        return UdpTransport(config['host'], config['port'])
+    if kind == ESPNOW:
+        peer = config.get('peer')
+        return EspNowTransport(ubinascii.unhexlify(peer) if peer else BROADCAST, config.get('channel'))
+    if kind == LOCAL:
+        return LocalTransport(config.get('local_port', LOCAL_PORT))
+    raise ValueError('unknown transport %s' % kind)
+
+
+class Bridge:
+    # frames from rx go out on tx unchanged, if they look like telemetry
+    def __init__(self, rx, tx):
+        self.rx = rx
+        self.tx = tx
+        self.received = 0
+        self.forwarded = 0
+        self.invalid = 0
+        self.failed = 0
+        self.peers = {}  # mac -> frames
+
+    async def run(self):
+        self.rx.open()
+        self.tx.open()
+        while True:
+            mac, msg = await self.rx.recv()
+            self.received += 1
+            if mac not in self.peers:
+                log.info('bridge', 'new peer %s', ubinascii.hexlify(mac).decode())
+            self.peers[mac] = self.peers.get(mac, 0) + 1
+            if (len(msg) < protocol.VERSION_OFFSET + 2
+                    or protocol.version(msg) not in protocol.VERSIONS):
+                self.invalid += 1
+                continue
+            if self.tx.send(msg):
+                self.forwarded += 1
+            else:
+                self.failed += 1
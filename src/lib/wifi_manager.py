@@ -1,56 +1,221 @@
-_D=False
-_C='never'
-_B=True
-_A='wifi'
-import json,time,os,network
-try:import uasyncio as asyncio
-except ImportError:pass
+# wifi_manager.py Keep the station connected without stalling the loop
+
+# /networks.json is read once:
+#   {"schema": 2,
+#    "known_networks": [{"ssid": ..., "password": ...}, ...],
+#    "access_point": {"start_policy": "never|always|fallback", "config": {...}}}
+#
+# connect() first tries the network that worked last, straight to its
+# BSSID and channel, which skips the scan. Only if that fails does it scan
+# and try the known networks in order of signal strength. Between status
+# checks it awaits, so the render and IMU keep going; wlan.scan() itself
+# still blocks for a second or two, the fast path avoids it.
+#
+# manage() keeps the connection, retrying with exponential backoff while
+# no network can be had. Or radio.py calls connect() and down() around
+# its bursts and the radio stays off in between. The last good network
+# is kept in /wifi.json, so it survives a deepsleep.
+
+import json
+
+import network
+import ubinascii
+import uasyncio as asyncio
+import utime
+from micropython import const
+
 import log
+
+CONFIG_FILE = '/networks.json'
+LAST_FILE = '/wifi.json'
+CONNECT_MS = const(8000)
+CHECK_MS = const(5000)
+BACKOFF_MIN_MS = const(1000)
+BACKOFF_MAX_MS = const(300000)
+_POLL_MS = const(100)
+_SCHEMA = const(2)
+
+NEVER = 'never'
+ALWAYS = 'always'
+FALLBACK = 'fallback'  # access point while the station is not connected
+
+
 class WifiManager:
-    _ap_start_policy=_C;config_file='/networks.json'
-    @classmethod
-    def start_managing(cls):log.info(_A,'Starting to manage...');loop=asyncio.get_event_loop();loop.create_task(cls.manage())
-    @classmethod
-    async def manage(cls):
-        while _B:
-            status=cls.wlan().status()
-            if status!=network.STAT_GOT_IP or cls.wlan().ifconfig()[0]=='0.0.0.0':log.info(_A,'Network not connected: managing');cls.setup_network()
-            await asyncio.sleep(10)
-    @classmethod
-    def ifconfig(cls):return cls.wlan().ifconfig()
-    @classmethod
-    def wlan(cls):return network.WLAN(network.STA_IF)
-    @classmethod
-    def accesspoint(cls):return network.WLAN(network.AP_IF)
-    @classmethod
-    def wants_accesspoint(cls):
-        static_policies={_C:_D,'always':_B}
-        if cls._ap_start_policy in static_policies:return static_policies[cls._ap_start_policy]
-        return cls.wlan().status()!=network.STAT_GOT_IP
-    @classmethod
-    def setup_network(cls):
-        C='password';B='bssid';A='ssid'
+    def __init__(self, config_file=CONFIG_FILE, last_file=LAST_FILE):
+        self.config_file = config_file
+        self.last_file = last_file
+        self.wlan = network.WLAN(network.STA_IF)
+        self.ap = network.WLAN(network.AP_IF)
+        self.ready = asyncio.Event()  # set while connected
+        self.backoff_ms = 0
+        self.connects = 0
+        self.failures = 0
+        self.scans = 0
+        self._config = None
+        self._last = None
+
+    def config(self):
+        # parsed once, {} without a usable file
+        if self._config is None:
+            try:
+                with open(self.config_file) as f:
+                    self._config = json.load(f)
+                if self._config.get('schema', 0) != _SCHEMA:
+                    log.warning('wifi', 'expected schema %d in %s', _SCHEMA, self.config_file)
+                policy = self._config.get('access_point', {}).get('start_policy', NEVER)
+                if policy not in (NEVER, ALWAYS, FALLBACK):
+                    log.warning('wifi', 'unknown start_policy %s, using fallback', policy)
+            except (OSError, ValueError):
+                log.info('wifi', 'no known networks in %s', self.config_file)
+                self._config = {}
+        return self._config
+
+    def known(self):
+        return self.config().get('known_networks', [])
+
+    def last(self):
+        # (ssid, bssid, channel) of the last good network, or None
+        if self._last is None:
+            try:
+                with open(self.last_file) as f:
+                    last = json.load(f)
+                self._last = (last['ssid'], ubinascii.unhexlify(last['bssid']), last['channel'])
+            except (OSError, ValueError, KeyError):
+                self._last = ()
+        return self._last or None
+
+    def _remember(self, ssid, bssid, channel):
+        if self._last == (ssid, bssid, channel):
+            return
+        self._last = (ssid, bssid, channel)
         try:
-            with open(cls.config_file,'r')as f:
-                config=json.loads(f.read());cls.preferred_networks=config['known_networks'];cls.ap_config=config['access_point']
-                if config.get('schema',0)!=2:log.warning(_A,'Did not get expected schema [2] in JSON config.')
-        except Exception as e:log.error(_A,'Failed to load config file, no known networks selected');cls.preferred_networks=[];return
-        cls.wlan().active(_B);available_networks=[]
-        for network in cls.wlan().scan():ssid=network[0].decode('utf-8');bssid=network[1];strength=network[3];available_networks.append(dict(ssid=ssid,bssid=bssid,strength=strength))
-        available_networks.sort(key=lambda station:station['strength'],reverse=_B);candidates=[]
-        for aPreference in cls.preferred_networks:
-            for aNetwork in available_networks:
-                if aPreference[A]==aNetwork[A]:connection_data={A:aNetwork[A],B:aNetwork[B],C:aPreference[C]};candidates.append(connection_data)
-        for new_connection in candidates:
-            log.info(_A,'Attempting to connect to network {0}...'.format(new_connection[A]))
-            if cls.connect_to(ssid=new_connection[A],password=new_connection[C],bssid=new_connection[B]):log.info(_A,'Successfully connected {0}'.format(new_connection[A]));break
-        cls._ap_start_policy=cls.ap_config.get('start_policy',_C);should_start_ap=cls.wants_accesspoint();cls.accesspoint().active(should_start_ap)
-        if should_start_ap:log.info(_A,'Enabling your access point...');cls.accesspoint().config(**cls.ap_config['config'])
-        cls.accesspoint().active(cls.wants_accesspoint());return cls.wlan().isconnected()
-    @classmethod
-    def connect_to(cls,*,ssid,password,**kwargs):
-        cls.wlan().connect(ssid,password,**kwargs)
-        for check in range(0,10):
-            if cls.wlan().isconnected():return _B
-            time.sleep_ms(500)
-        return _D
\ No newline at end of file
+            with open(self.last_file, 'w') as f:
+                json.dump({'ssid': ssid, 'bssid': ubinascii.hexlify(bssid).decode(),
+                           'channel': channel}, f)
+        except OSError as e:
+            log.warning('wifi', 'could not save %s: %s', self.last_file, e)
+
+    def _forget(self):
+        self._last = ()
+
+    def _password(self, ssid):
+        for known in self.known():
+            if known['ssid'] == ssid:
+                return known.get('password')
+        return None
+
+    def isconnected(self):
+        return self.wlan.isconnected() and self.wlan.ifconfig()[0] != '0.0.0.0'
+
+    def ifconfig(self):
+        return self.wlan.ifconfig()
+
+    async def _connect_to(self, ssid, password, bssid=None, channel=None):
+        log.info('wifi', 'connecting to %s', ssid)
+        if self.wlan.isconnected():
+            self.wlan.disconnect()
+        if channel:
+            try:
+                self.wlan.config(channel=channel)
+            except (OSError, ValueError):
+                pass  # no channel hint on this port
+        try:
+            if bssid:
+                self.wlan.connect(ssid, password, bssid=bssid)
+            else:
+                self.wlan.connect(ssid, password)
+        except OSError as e:
+            log.warning('wifi', 'connect to %s: %s', ssid, e)
+            return False
+        start = utime.ticks_ms()
+        while utime.ticks_diff(utime.ticks_ms(), start) < CONNECT_MS:
+            await asyncio.sleep_ms(_POLL_MS)
+            if self.isconnected():
+                return True
+            status = self.wlan.status()
+            if status in (network.STAT_WRONG_PASSWORD, network.STAT_NO_AP_FOUND):
+                log.warning('wifi', '%s: status %d', ssid, status)
+                break
+        self.wlan.disconnect()
+        return False
+
+    async def _scan(self):
+        # [(rssi, ssid, bssid, channel)] of known networks, strongest first
+        await asyncio.sleep_ms(0)
+        self.scans += 1
+        try:
+            found = self.wlan.scan()
+        except OSError as e:
+            log.warning('wifi', 'scan: %s', e)
+            return []
+        await asyncio.sleep_ms(0)
+        names = [k['ssid'] for k in self.known()]
+        candidates = []
+        for net in found:
+            ssid = net[0].decode()
+            if ssid in names:
+                candidates.append((net[3], ssid, net[1], net[2]))
+        candidates.sort(reverse=True)
+        return candidates
+
+    async def connect(self):
+        # one round: the last good network, then a scan; True if connected
+        if not self.known():
+            return False
+        self.wlan.active(True)
+        last = self.last()
+        if last:
+            ssid, bssid, channel = last
+            password = self._password(ssid)
+            if password is not None and await self._connect_to(ssid, password, bssid, channel):
+                return self._connected(ssid, bssid, channel)
+            self._forget()
+        for rssi, ssid, bssid, channel in await self._scan():
+            if await self._connect_to(ssid, self._password(ssid), bssid, channel):
+                return self._connected(ssid, bssid, channel)
+        self.failures += 1
+        return False
+
+    def _connected(self, ssid, bssid, channel):
+        self.connects += 1
+        self._remember(ssid, bssid, channel)
+        self.ready.set()
+        log.info('wifi', 'connected to %s: %s', ssid, self.wlan.ifconfig()[0])
+        return True
+
+    def down(self):
+        # radio off until the next connect(), for radio.py
+        self.ready.clear()
+        if self.wlan.active():
+            # disconnect() raises on an inactive STA on the ESP32
+            self.wlan.disconnect()
+        self.wlan.active(False)
+
+    def _access_point(self):
+        ap = self.config().get('access_point', {})
+        # no policy is never, an unknown one fallback, as before
+        policy = ap.get('start_policy', NEVER)
+        wanted = policy == ALWAYS or (policy != NEVER and not self.isconnected())
+        if wanted != self.ap.active():
+            log.info('wifi', 'access point %s', 'on' if wanted else 'off')
+            self.ap.active(wanted)
+            if wanted:
+                self.ap.config(**ap.get('config', {}))
+
+    async def manage(self):
+        if not self.known():
+            return
+        while True:
+            if self.isconnected():
+                self.ready.set()
+                self.backoff_ms = 0
+                await asyncio.sleep_ms(CHECK_MS)
+                continue
+            self.ready.clear()
+            if await self.connect():
+                self._access_point()
+                continue
+            self._access_point()
+            self.backoff_ms = min(self.backoff_ms * 2 or BACKOFF_MIN_MS, BACKOFF_MAX_MS)
+            log.info('wifi', 'no network, retry in %dms', self.backoff_ms)
+            await asyncio.sleep_ms(self.backoff_ms)
@@ -1,42 +1,91 @@
 import log
-import sys
-from machine import ADC, Pin, SoftI2C
+from array import array
+from machine import ADC, I2C, Pin
 import random
+import utime
 import ujson
 import ubinascii
 import neopixel
-import fancyled as fancy
+from palettes import mixer_palette
+from palette import CompiledPalette, PHASE_ONE, PHASE_MASK
+from frame import FrameBuffer
+from compositor import Compositor, PaletteLayer, SparkleLayer, AlertLayer
+from governor import FrameGovernor
+from power import PowerManager
+from fuelgauge import FuelGauge
+from status import Status, NORMAL
+from telemetry import LogLines, Telemetry
+from flashlog import FlashLog
+import protocol
+import transport
+from radio import RadioScheduler, HIGH_WATER
 from BMI160 import BMI160_I2C
+from imu import ImuFifo, FRAME_VALUES
+from fusion import Fusion
+from gait import GaitDetector, REST, NAMES as GAIT_NAMES
 import uasyncio as asyncio
 from primitives import EButton
 import aioprof
 import aiorepl
 import filters
-#from wifi_manager import WifiManager
+from wifi_manager import WifiManager
 
 class Shared:
     def __init__(self):
         self.balance = 0
         self.palette_idx = 0
-        self.rot_avg_short = 0
-        self.rot_avg_long = 0
-        self.vbat = 0
+        self.pitch = 0.0
+        self.roll = 0.0
+        self.activity = 0  # deg/s equivalent, see fusion.py
+        self.act_avg_short = 0
+        self.act_avg_long = 0
+        self.steps = 0
+        self.cadence = 0  # steps/min
+        self.gait = REST
+        self.speed = 0  # cm/s, see gait.py
+        self.vbat = 0  # V
+        self.soc = 0  # permille, see fuelgauge.py
+        self.runtime = None  # minutes
+        self.charging = False
 
         self.bright = 0.6
         self.delta = 0
         self.flash = 1
         self.ifconfig = {}
-        self.low_power = False
+        self.low_power = False  # owned by the status machine
+        self.status = None
         self.zero_motion = False
+        self.sleeping = False
+
+        self.fps = 0
+        self.frames_late = 0
+        self.frames_dropped = 0
 
 
 # in the beginning there is the declaration of a protocol version
-VERSION = const(0x06)
+VERSION = const(0x07)  # see protocol.py, stream.json can ask for 6
 VBAT_CORR = const(218)
+SOC_FULL_BRIGHT = const(600)  # permille, dimmed below, down to BALANCE_EMPTY
+BALANCE_EMPTY = -0.5
+BALANCE_LOW_POWER = -0.4
 NUM_LEDS = const(44)
 LOW_ACCEL_THRESH = const(5200)
-OFFSET_INCR_DIV = const(640000)
+PHASE_REST = const(52)  # palette phase per frame, keeps it moving at rest
+PHASE_PER_CMS = const(6)  # palette phase per frame per cm/s of gait speed
+DELTA_FPS_FULL = const(6)  # deg/s of activity change for the full frame rate
+FPS_MIN = const(10)
+FPS_MAX = const(50)
+FPS_LOW_POWER = const(20)
+FPS_STATS_MS = const(10000)
 FILE_UID = "/uid.json"
+FILE_STREAM = "/stream.json"  # telemetry host, port, optional version, rate Hz, batch, burst s, transport
+IMU_HZ = const(50)
+# datagrams buffered between radio bursts, 24 KB is a fifth of the heap an
+# ESP32 without PSRAM starts with: 18 s of 50 Hz in batches of 8
+RADIO_QUEUE_BYTES = const(24576)
+RECORD_HZ = const(5)  # into the flash log, 0 for none
+TELEMETRY_HZ_V6 = const(10)  # one datagram per sample
+POWER_STATE = "BBB"  # palette_idx, flash, manual low kept through deepsleep
 
 
 led_board = neopixel.NeoPixel(machine.Pin(27, Pin.OUT), 1)  # GPIO27
@@ -44,15 +93,20 @@ led_board[0] = (30, 0, 30, 0)
 led_board.write()
 
 led_strip = neopixel.NeoPixel(machine.Pin(32), NUM_LEDS, bpp=3)  # GPIO32
-led_strip.fill((0,0,0))
-led_strip.write()
+frame = FrameBuffer(led_strip)
+frame.clear()
+frame.show()
 
 vbat_pin = Pin(33, Pin.IN)  # GPIO33
 vbat_adc = ADC(vbat_pin)
 vbat_adc.atten(ADC.ATTN_11DB)  # 3.3V
+fuel = FuelGauge(vbat_adc, VBAT_CORR / 100)
+status = Status()
 
 # infra_pin = Pin(12, Pin.IN)  # GPIO12
 
+imu_int_pin = Pin(34, Pin.IN)  # GPIO34, BMI160 INT1
+
 button_pin = Pin(39, Pin.IN, Pin.PULL_DOWN)  # GPIO39
 button = EButton(button_pin, sense=1, suppress=1)
 button.double_click_ms = 1000
@@ -64,17 +118,15 @@ async def eb_press(shared):
         button.press.clear()  # Clear the event flag
         shared.palette_idx = (shared.palette_idx + 1) % len(mixer_palette)
         # Log the updated palette index directly
-        log.info('btn', 'palette: {}'.format(shared.palette_idx))
+        log.info('btn', 'palette: %d', shared.palette_idx)
 
 
 async def eb_long(shared):
     while True:
         await button.long.wait()  # Wait for long-press event
         button.long.clear()  # Clear the event flag
-        shared.low_power = not shared.low_power  # Toggle the low_power state
-        shared.balance = -0.4 if shared.low_power else 0
-        # Log the current low_power state and balance directly
-        log.info('btn', 'low_power: {}, balance: {}'.format(shared.low_power, shared.balance))
+        status.button()  # normal <-> low
+        log.info('btn', 'status: %s, balance: %s', status.name, shared.balance)
 
 
 async def eb_double(shared):
@@ -82,7 +134,7 @@ async def eb_double(shared):
         await button.double.wait()  # Wait for double-click event
         button.double.clear()  # Clear the event flag
         shared.flash = not shared.flash  # Toggle the flash state
-        log.info('btn', 'flash: {}'.format(shared.flash))  # Log the current flash state directly
+        log.info('btn', 'flash: %s', shared.flash)  # Log the current flash state directly
 
 
 def read_json(filename):
@@ -90,12 +142,12 @@ def read_json(filename):
         with open(filename, "r") as f:
             return ujson.load(f)
     except (OSError, ValueError) as e:
-        log.error("json", f"Error reading/parsing {filename}: {e}")
+        log.error("json", "Error reading/parsing %s: %s", filename, e)
     return None
 
 
 def write_json(filename, data):
-    log.info("json", f"writing {filename}")
+    log.info("json", "writing %s", filename)
     with open(filename, "w") as f:
         ujson.dump(data, f)
 
@@ -112,9 +164,51 @@ if not stored_uid or stored_uid.get("uid") != MACHINE_UID:
 
 log.info("uid", MACHINE_UID)
 
-
-# frequency high, updates lots
-i2c = SoftI2C(scl=Pin(21), sda=Pin(25), freq=400000)  # SCL: GPIO21, SDA: GPIO25
+stream = read_json(FILE_STREAM)
+telemetry = None
+burst_s = 0
+if stream:
+    version = stream.get("version", VERSION)
+    rate = stream.get("rate", IMU_HZ if version >= 7 else TELEMETRY_HZ_V6)
+    link = transport.create(stream)
+    batch = min(stream.get("batch", 8), protocol.max_count(link.max_size)) if version >= 7 else 1
+    every = max(1, IMU_HZ // rate)
+    # with a burst interval the radio is off in between and the queue holds
+    # a burst below the high water mark; what doesn't fit shortens the interval
+    burst_s = stream.get("burst", 0)
+    queue = 8
+    if burst_s:
+        per_s = IMU_HZ / every / batch  # datagrams
+        most = RADIO_QUEUE_BYTES // protocol.size(version, protocol.SCHEMA_IMU, batch)
+        queue = min(most, int(burst_s * per_s / HIGH_WATER) + 1)
+        if queue == most:
+            fits = int((most - 1) * HIGH_WATER / per_s)
+            if fits < burst_s:
+                log.warning("radio", "burst every %ds instead of %ds, the queue holds %d datagrams",
+                            fits, burst_s, most)
+                burst_s = max(1, fits)
+    telemetry = Telemetry(MACHINE_UID.encode(), link, version,
+                          batch=batch, every=every,
+                          sample_us=1000000 // IMU_HZ, queue=queue)
+    log.info("telemetry", "v%d over %s, %d per datagram", version,
+             stream.get("transport", transport.UDP), telemetry.batch)
+
+flashlog = None
+if RECORD_HZ:
+    flashlog = FlashLog(every=IMU_HZ // RECORD_HZ, sample_ms=1000 // IMU_HZ)
+    flashlog.open()
+
+wifi = WifiManager()  # /networks.json, see wifi_manager.py
+radio = None
+if telemetry and burst_s and (wifi.known() or not link.needs_wifi):
+    # ESP-NOW only needs the interface up, not the association
+    # log records from INFO up go along, see log.forward
+    sources = (telemetry, LogLines(MACHINE_UID.encode(), link))
+    radio = RadioScheduler(wifi if link.needs_wifi else link, sources, every_ms=burst_s * 1000)
+    log.info("radio", "bursts every %ds, queue %d", burst_s, telemetry.capacity)
+
+# frequency high, updates lots; hardware peripheral, not bit-banged
+i2c = I2C(0, scl=Pin(21), sda=Pin(25), freq=400000)  # SCL: GPIO21, SDA: GPIO25
 # print(i2c.scan())
 log.debug('i2c', i2c)
 
@@ -129,54 +223,98 @@ imu.setFullScaleGyroRange(3)  # Set gyroscope full-scale range to ±250 deg/s
 imu.setZeroMotionDetectionDuration(1)  # Set zero motion detection duration to 1 second
 imu.setZeroMotionDetectionThreshold(2)  # Set zero motion detection threshold to 2
 imu.setIntZeroMotionEnabled(True)  # Enable zero motion interrupt
-log.debug('imu', 'temperature: {}'.format(imu.getTemperature()))
-
-
-async def task_imu(shared):
-   maf_long = filters.MovingAverageFilter(10)
-   maf_short = filters.MovingAverageFilter(4)
-
-   prev_rotations = [0, 0, 0]  # Initialize previous rotation values
-   sum_rotation = 0  # Initialize sum of absolute rotations
+# accel and gyro frames at 50 Hz, collected in batches of 8 (160 ms)
+imu_fifo = ImuFifo(i2c, imu_int_pin, watermark=8)
+imu_fifo.read_status()
+log.debug('imu', 'temperature: %s', imu_fifo.temperature())
 
-   while True:
-       rotations = imu.getRotation()
-       # Update sum_rotation incrementally
-       sum_rotation -= sum(abs(x) for x in prev_rotations)
-       sum_rotation += sum(abs(x) for x in rotations)
-       prev_rotations = rotations
+# naps after 30 s without motion, deepsleep after 10 min of naps
+power = PowerManager(imu_fifo, buttons=(button_pin,))
 
-       shared.rot_avg_long = maf_long.update(sum_rotation)
-       shared.rot_avg_short = maf_short.update(sum_rotation)
-       shared.zero_motion = imu.getIntZeroMotionStatus()
 
-       if shared.zero_motion:
-           log.info('imu', 'zero motion interrupt')
-           sleep_time = 1000
-       else:
-           # Adjust sleep_time based on the rate of change in sensor data
-           shared.delta = int(abs(sum_rotation - shared.rot_avg_long))
-           sleep_time = max(50, 200 - shared.delta // 10)
-
-       await asyncio.sleep_ms(sleep_time)
+async def task_imu(shared):
+    fusion = Fusion(odr=50)
+    gait = GaitDetector(odr=50)
+    # windows in samples at 50 Hz, 2 s and 0.8 s, exact integer sums
+    maf_long = filters.MovingAverageFilter(100, 'i')
+    maf_short = filters.MovingAverageFilter(40, 'i')
+    samples = imu_fifo.samples
+    # activity after every frame of the batch
+    activity = array('i', [0]) * (len(samples) // FRAME_VALUES)
+
+    if power.woke_from_deepsleep:
+        # still in its sleeping mode
+        await imu_fifo.resume()
+    else:
+        imu_fifo.start()
+    while True:
+        frames = await imu_fifo.read()
+        if frames:
+            fusion.update_block(samples, frames, FRAME_VALUES, activity)
+            shared.pitch = fusion.pitch
+            shared.roll = fusion.roll
+            shared.activity = fusion.activity
+            shared.act_avg_long = maf_long.update_block(activity, frames)
+            shared.act_avg_short = maf_short.update_block(activity, frames)
+            shared.delta = abs(fusion.activity - shared.act_avg_long)
+            if telemetry:
+                telemetry.status(int(shared.vbat * 1000), shared.soc,
+                                 int(imu_fifo.temperature() * 100), shared.fps)
+                telemetry.frames(samples, frames, FRAME_VALUES,
+                                 int(fusion.pitch * 100), int(fusion.roll * 100))
+            if gait.update_block(samples, frames, FRAME_VALUES) or gait.gait != shared.gait:
+                shared.steps = gait.steps
+                shared.cadence = gait.cadence
+                shared.speed = gait.speed
+                if gait.gait != shared.gait:
+                    shared.gait = gait.gait
+                    log.info('imu', 'gait: %s, cadence: %d', GAIT_NAMES[gait.gait], gait.cadence)
+            if flashlog:
+                flashlog.frames(samples, frames, FRAME_VALUES,
+                                int(fusion.pitch * 100), int(fusion.roll * 100), int(shared.activity),
+                                shared.speed, shared.gait, int(shared.vbat * 1000), shared.soc)
+
+        if imu_fifo.zero_motion != shared.zero_motion:
+            shared.zero_motion = imu_fifo.zero_motion
+            log.info('imu', 'zero motion: %s', shared.zero_motion)
+
+
+def apply_status(shared):
+    # on every status change
+    shared.status = status.name
+    shared.low_power = status.low_power
+    battery_policy(shared)
+
+
+def battery_policy(shared):
+    # brightness goes down with the charge, in steps of 0.05
+    balance = 0
+    if fuel.present() and shared.soc < SOC_FULL_BRIGHT:
+        balance = round(BALANCE_EMPTY * (SOC_FULL_BRIGHT - shared.soc) / SOC_FULL_BRIGHT * 20) / 20
+    if shared.low_power:
+        balance += BALANCE_LOW_POWER
+    # render recompiles on a new object, only hand over real changes
+    if balance != shared.balance:
+        shared.balance = balance
 
 
 async def task_vbat(shared):
-    # Precompute constant for voltage conversion
-    VBAT_CONV_FACTOR = 0.00080586 * 2.18  # (3.3 / 4095 * VBAT_CORR / 100)
-
     while True:
-        # Read ADC and convert to voltage
-        val = vbat_adc.read()
-        shared.vbat = round(val * VBAT_CONV_FACTOR, 2)
-
-        if shared.vbat > 0:
-            log.debug('vbat', '%sV', shared.vbat)
-
-        # Adjust sleep time based on voltage level to reduce frequency of checks
-        if shared.vbat > 3.5:
+        if fuel.update():
+            shared.vbat = fuel.mv / 1000
+            log.debug('vbat', '%dmV, soc: %d, drain: %s/h, runtime: %smin',
+                      fuel.mv, fuel.soc, fuel.drain, fuel.runtime)
+            shared.soc = fuel.soc
+            battery_policy(shared)
+        shared.runtime = fuel.runtime
+        shared.charging = fuel.charging()
+        # only a change of level is a status event
+        status.battery(fuel.soc, shared.charging, fuel.present())
+
+        # less often while there is plenty left
+        if fuel.soc > 500:
             sleep_time = 3000
-        elif shared.vbat > 3.2:
+        elif fuel.soc > 200:
             sleep_time = 2000
         else:
             sleep_time = 1000
@@ -185,52 +323,27 @@ async def task_vbat(shared):
 
 
 async def task_blink(shared):
+    # color and interval come with the status, see status.py
     while True:
-        vbat = shared.vbat
-        if vbat > 4.0:
-            color = (0, 10, 0, 0)
-            sleep_time = 1500
-            shared.balance = 0
-        elif vbat > 3.8:
-            color = (5, 5, 0, 0)
-            sleep_time = 1000
-            shared.balance = -0.1
-        elif vbat > 3.5:
-            color = (10, 0, 0, 0)
-            sleep_time = 750
-            shared.balance = -0.3
-        elif vbat > 3.2:
-            color = (10, 0, 5, 0)
-            sleep_time = 500
-            shared.balance = -0.5
-            shared.low_power = True
-        else:
-            color = (0, 0, 10, 0)
-            sleep_time = 1000
-            shared.balance = 0
-            shared.low_power = False
-
-        led_board[0] = color
-        led_board.write()
-        await asyncio.sleep(0.02)
-        led_board[0] = (0, 0, 0)
-        led_board.write()
-        await asyncio.sleep(sleep_time / 1000)
-
-
-# async def task_network(shared):
-#     WifiManager.start_managing()
-#     await asyncio.sleep_ms(250)  # Adjust sleep duration as needed
-#     try:
-#         while True:
-#             # Check if WiFi is connected
-#             if WifiManager.wlan().status() == 1010:
-#                 shared.ifconfig = WifiManager.ifconfig()
-#                 log.info('net', 'connected: {}'.format(shared.ifconfig))
-#                 return  # Exit function once connected
-#             await asyncio.sleep_ms(500)  # Adjust sleep duration as needed
-#     except Exception as e:
-#         log.error('net', 'error connecting to wifi: {}'.format(e))
+        if status.color is not None:
+            led_board[0] = status.color
+            led_board.write()
+            await asyncio.sleep_ms(20)
+            led_board[0] = (0, 0, 0)
+            led_board.write()
+        await asyncio.sleep_ms(status.interval)
+
+
+async def task_network(shared):
+    # wifi.manage() keeps the connection, this mirrors it into shared
+    while True:
+        await wifi.ready.wait()
+        shared.ifconfig = wifi.ifconfig()
+        log.info('net', 'connected: %s', shared.ifconfig[0])
+        while wifi.isconnected():
+            await asyncio.sleep_ms(1000)
+        shared.ifconfig = {}
+        log.info('net', 'disconnected')
 
 
 # async def task_gc():
@@ -243,46 +356,78 @@ async def task_blink(shared):
 #         # adjust the threshold for the meantime
 #         gc.threshold(gc.mem_free() // 4 + gc.mem_alloc())
 #         # and give info for reference
-#         log.debug('gc', 'free: {}, allocated: {}'.format(gc.mem_free(), gc.mem_alloc()))
+#         log.debug('gc', 'free: %d, allocated: %d', gc.mem_free(), gc.mem_alloc())
 
 
-async def task_led_strip(shared):
-    mixer_offset = 0
-    while True:
-        bright = shared.bright + shared.balance
-        avg = shared.rot_avg_long
-        if (avg < 500):
-            avg = 500
-        mixer_offset += avg / OFFSET_INCR_DIV
-        for i in range(NUM_LEDS):
-            offset = mixer_offset + i / NUM_LEDS
-            color = fancy.palette_lookup(mixer_palette[shared.palette_idx], offset)
-            color = fancy.gamma_adjust(color, brightness=bright)
-            color_packed = color.pack()
-            led_strip[i] = ((color_packed & 0xff0000) >> 16, (color_packed & 0xff00) >> 8, color_packed & 0xff)
-        led_strip.write()
-
-        sleep_time = max(20, 100 - shared.delta // 10)
-        #print(sleep_time)
-        await asyncio.sleep_ms(sleep_time)
+def start_display(shared):
+    return [asyncio.create_task(task_blink(shared)), asyncio.create_task(task_render(shared))]
 
 
-async def task_twinkle(shared):
+async def task_power(shared):
+    display = start_display(shared)
+    while True:
+        await power.wait_idle()
+        log.info('power', 'resting, going to sleep')
+        for task in display:
+            task.cancel()
+        shared.sleeping = True
+        _stop()
+        power.save(POWER_STATE, shared.palette_idx, shared.flash, status.manual_low)
+        if flashlog:
+            await flashlog.sync()
+        status.sleep()
+        reason = await power.sleep()
+        status.wake()
+        shared.sleeping = False
+        log.info('power', 'awake, reason: %d, naps: %d', reason, power.naps)
+        display = start_display(shared)
+
+
+def frame_rate(shared):
+    # the faster the motion changes, the more frames
+    fps = FPS_MIN + (FPS_MAX - FPS_MIN) * min(shared.delta, DELTA_FPS_FULL) // DELTA_FPS_FULL
+    if shared.low_power:
+        fps = min(fps, FPS_LOW_POWER)
+    return fps
+
+
+async def task_render(shared):
     random.seed()
-    flash_delay = 20  # Delay in milliseconds for the flash
-    no_flash_delay = 1000  # Delay in milliseconds for no flash
-
+    compositor = Compositor(frame)
+    # base: palette position in PHASE_ONE units, no floats in the frame loop
+    base = compositor.add(PaletteLayer(CompiledPalette(), PHASE_ONE // NUM_LEDS))
+    sparkle = compositor.add(SparkleLayer(frame.color(210, 210, 210), frame.color(0, 0, 0)))
+    alert = compositor.add(AlertLayer((0,)))
+    alert_low_power = frame.color(40, 12, 0)
+    # identity of the inputs the table was compiled from
+    palette_idx = bright = balance = None
+    governor = FrameGovernor(FPS_MAX, FPS_MIN, FPS_MAX)
+    stats_at = utime.ticks_ms()
     while True:
-        if shared.flash:
-            rand_led = random.randint(0, NUM_LEDS - 1)
-            led_strip[rand_led] = (210, 210, 210) if rand_led % 2 else (0, 0, 0)
-            led_strip.write()
-            await asyncio.sleep_ms(flash_delay)
-            led_strip[rand_led] = (0, 0, 0)  # Turn off the LED
-            led_strip.write()
-            await asyncio.sleep_ms(600 - flash_delay)  # Compensate for the flash delay
-        else:
-            await asyncio.sleep_ms(no_flash_delay)
+        governor.start()
+        if (shared.palette_idx != palette_idx or shared.bright != bright
+                or shared.balance != balance):
+            palette_idx = shared.palette_idx
+            bright = shared.bright
+            balance = shared.balance
+            base.lut.compile(mixer_palette[palette_idx], bright + balance)
+        # the palette runs with the dog, not with every wiggle of the collar
+        base.phase = (base.phase + PHASE_REST + shared.speed * PHASE_PER_CMS) & PHASE_MASK
+        sparkle.enabled = shared.flash
+        alert.color = alert_low_power if shared.low_power else None
+        compositor.compose()
+
+        governor.set_fps(frame_rate(shared))
+        shared.fps = governor.fps
+        shared.frames_late = governor.late
+        shared.frames_dropped = governor.dropped
+        if utime.ticks_diff(utime.ticks_ms(), stats_at) >= FPS_STATS_MS:
+            stats_at = utime.ticks_ms()
+            log.debug('render', 'fps: %d, frames: %d, late: %d, dropped: %d, busy max: %dms',
+                      governor.fps, governor.frames, governor.late, governor.dropped,
+                      governor.busy_max_ms)
+            governor.reset_stats()  # counts are per FPS_STATS_MS
+        await governor.wait()
 
 
 async def task_prof():
@@ -291,164 +436,41 @@ async def task_prof():
         await asyncio.sleep_ms(5000)
 
 
-# TODO: revamp
-mixer_palette = []
-
-# yoko
-mixer_palette.append([
-    fancy.CRGB(0.7, 0.0, 0.0),  # Red
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.7, 0.4, 0.0),  # Orange
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.7),  # Blue
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.7, 0.0, 0.4),  # Magenta
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.7, 0.0, 0.0),  # Red
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.7, 0.0, 0.4),  # Magenta
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.7),  # Blue
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.7, 0.4, 0.0),  # Orange
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-])
-
-# efficient
-mixer_palette.append([
-    fancy.CRGB(0.9, 0.0, 0.1),  # Red
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.8, 0.0, 0.0),  # Red
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.9, 0.0, 0.1),  # Red
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.8, 0.0, 0.0),  # Red
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-])
-
-# brightsafe
-mixer_palette.append([
-    fancy.CRGB(0.0, 0.4, 0.5),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.5, 0.0, 0.6),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.8, 0.0, 0.7),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.4, 0.6),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.4, 0.5),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.5, 0.0, 0.6),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.8, 0.0, 0.7),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.4, 0.6),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-])
-
-# xmas
-mixer_palette.append([
-    fancy.CRGB(0.0, 0.0, 0.4),  # Red
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.4, 0.0),  # Green
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.8),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.7, 0.0),  # Green
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.4),  # Red
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.4, 0.0),  # Green
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.8),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.7, 0.0),  # Green
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-    fancy.CRGB(0.0, 0.0, 0.0),
-])
-
 aioprof.enable()
 
 async def main():
     tasks = []
     shared = Shared()
-    # tasks
+    status.start(lambda _: apply_status(shared))
+    state = power.restore(POWER_STATE)
+    if state:
+        log.info('power', 'woke from deepsleep')
+        shared.palette_idx, shared.flash, manual_low = state
+        if manual_low and status.name == NORMAL:
+            # was switched to low by hand
+            status.button()
+    # tasks, blink and render are started and stopped by task_power
     tasks.append(asyncio.create_task(task_vbat(shared)))
     tasks.append(asyncio.create_task(task_imu(shared)))
-    tasks.append(asyncio.create_task(task_blink(shared)))
-    tasks.append(asyncio.create_task(task_twinkle(shared)))
-    tasks.append(asyncio.create_task(task_led_strip(shared)))
+    tasks.append(asyncio.create_task(task_power(shared)))
     tasks.append(asyncio.create_task(eb_press(shared)))
     tasks.append(asyncio.create_task(eb_double(shared)))
     tasks.append(asyncio.create_task(eb_long(shared)))
-    # tasks.append(asyncio.create_task(task_network(shared)))
+    if radio:
+        # the radio is only on for bursts, telemetry waits for them
+        tasks.append(asyncio.create_task(radio.run()))
+    elif wifi.known():
+        tasks.append(asyncio.create_task(wifi.manage()))
+        tasks.append(asyncio.create_task(task_network(shared)))
+    if telemetry and not radio:
+        tasks.append(asyncio.create_task(telemetry.run()))
+    if flashlog:
+        tasks.append(asyncio.create_task(flashlog.run()))
 
     # gc = asyncio.create_task(task_gc())
     # tasks.append(asyncio.create_task(task_prof()))
+    # printing the log waits for the other tasks
+    tasks.append(asyncio.create_task(log.drain()))
     repl = asyncio.create_task(aiorepl.task())
     await asyncio.gather(*tasks, repl)
 
@@ -456,8 +478,8 @@ async def main():
 def _stop():
     led_board.fill((0,0,0))
     led_board.write()
-    led_strip.fill((0,0,0))
-    led_strip.write()
+    frame.clear()
+    frame.show()
 
 
 # tidy memory
@@ -470,8 +492,8 @@ try:
     log.info("main", "running")
     asyncio.run(main())
 except Exception as excp:
-    log.error("main", "exception")
-    sys.print_exception(excp)
+    log.exception("main", excp)
 finally:
+    log.flush()
     _stop()
     asyncio.new_event_loop()
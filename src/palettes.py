@@ -0,0 +1,143 @@
+# palettes.py Strip palettes, cycled with a button press
+
+import fancyled as fancy
+
+# TODO: revamp
+mixer_palette = []
+
+# yoko
+mixer_palette.append([
+    fancy.CRGB(0.7, 0.0, 0.0),  # Red
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.7, 0.4, 0.0),  # Orange
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.7),  # Blue
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.7, 0.0, 0.4),  # Magenta
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.7, 0.0, 0.0),  # Red
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.7, 0.0, 0.4),  # Magenta
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.7),  # Blue
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.7, 0.4, 0.0),  # Orange
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+])
+
+# efficient
+mixer_palette.append([
+    fancy.CRGB(0.9, 0.0, 0.1),  # Red
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.8, 0.0, 0.0),  # Red
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.9, 0.0, 0.1),  # Red
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.8, 0.0, 0.0),  # Red
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+])
+
+# brightsafe
+mixer_palette.append([
+    fancy.CRGB(0.0, 0.4, 0.5),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.5, 0.0, 0.6),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.8, 0.0, 0.7),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.4, 0.6),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.4, 0.5),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.5, 0.0, 0.6),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.8, 0.0, 0.7),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.4, 0.6),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+])
+
+# xmas
+mixer_palette.append([
+    fancy.CRGB(0.0, 0.0, 0.4),  # Red
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.4, 0.0),  # Green
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.8),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.7, 0.0),  # Green
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.4),  # Red
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.4, 0.0),  # Green
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.8),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.7, 0.0),  # Green
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+    fancy.CRGB(0.0, 0.0, 0.0),
+])
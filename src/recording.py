@@ -0,0 +1,65 @@
+# recording.py Columnar recordings written by collector.py and dumplog.py
+
+# A recording is a directory with one file per column, each a raw array
+# appended in chunks, plus meta.json with the column names, array
+# typecodes and whatever else the writer knows. load() reads one back,
+# with numpy np.fromfile(path, dtype) per column does too.
+
+import json
+import os
+import sys
+import time
+from array import array
+
+CHUNK = 4096  # samples per column before they go to disk
+
+
+class Recorder:
+    def __init__(self, path, uid, columns, **meta):
+        # columns are (name, typecode), the first one counts the samples
+        self.path = path
+        self.columns = columns
+        os.makedirs(path, exist_ok=True)
+        meta.update({
+            'uid': uid, 'start': meta.get('start', time.time()), 'byteorder': sys.byteorder,
+            'columns': [{'name': n, 'typecode': t, 'itemsize': array(t).itemsize} for n, t in columns],
+        })
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=1)
+        self.buffers = {n: array(t) for n, t in columns}
+        self.files = {n: open(os.path.join(path, n + '.bin'), 'ab') for n, _ in columns}
+        self._first = columns[0][0]
+
+    def extend(self, cols):
+        # cols maps every column name to a sequence, all of the same length
+        for name, buf in self.buffers.items():
+            buf.extend(cols[name])
+        if len(self.buffers[self._first]) >= CHUNK:
+            self.flush()
+
+    def flush(self):
+        for name, buf in self.buffers.items():
+            buf.tofile(self.files[name])
+            self.files[name].flush()
+            del buf[:]
+
+    def close(self):
+        self.flush()
+        for f in self.files.values():
+            f.close()
+
+
+def load(path):
+    # {column name: array} of a recording
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+    data = {}
+    for col in meta['columns']:
+        arr = array(col['typecode'])
+        name = os.path.join(path, col['name'] + '.bin')
+        with open(name, 'rb') as f:
+            arr.frombytes(f.read())
+        if meta['byteorder'] != sys.byteorder:
+            arr.byteswap()
+        data[col['name']] = arr
+    return data
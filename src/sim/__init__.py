@@ -0,0 +1,178 @@
+# sim Host-side stand-ins for the collar hardware
+
+# install() puts fake machine, network, neopixel, BMI160, aioprof and aiorepl
+# modules in front of sys.path, driven by IMU and battery traces from
+# sim.traces. On CPython it also provides micropython, utime and uasyncio,
+# the latter running on an event loop with a virtual clock, so main.py
+# can be run for minutes of device time in a fraction of that.
+#
+#   cd src && python -m sim --duration 120
+#
+# On the MicroPython unix port only the hardware modules are replaced and
+# the port's own uasyncio runs in real time:
+#
+#   micropython -c "import sim; sim.install(); exec(open('main.py').read())"
+
+import sys
+import os
+
+from sim.clock import VirtualClock, RealClock
+from sim import traces
+
+_ROOT = __file__.rsplit('/', 2)[0] if '/' in __file__ else '.'
+CPYTHON = sys.implementation.name == 'cpython'
+
+world = None
+
+
+class World:
+    def __init__(self, clock, imu, battery, duration=None):
+        self.clock = clock
+        self.imu = imu
+        self.battery = battery
+        self.duration = duration  # seconds of device time, None runs forever
+        self.pins = {}  # pin id -> input level
+        self.irqs = {}  # pin id -> (handler, pin)
+        self.i2c_devices = {}  # address -> register model
+        self.strips = {}  # pin id -> NeoPixel
+        self.writes = {}  # pin id -> number of write() calls
+        self.presses = []  # (start ms, end ms, pin id)
+        self.flash_dir = None  # host directory standing in for the device root
+        self.imu_int_pin = 34  # BMI160 INT1
+        self.reset_cause = 1  # machine.PWRON_RESET
+        self.wake_reason = 0
+        self.wake_ext0 = None  # ((pin id,), level) from esp32.wake_on_ext0
+        self.wake_ext1 = None  # ((pin ids), level) from esp32.wake_on_ext1
+        self.boots = 1
+        # access points in range, for network.WLAN
+        self.networks = [
+            {'ssid': 'dogspeed', 'bssid': bytes((0x02, 0xD0, 0x65, 0x00, 0x00, 0x01)),
+             'channel': 6, 'rssi': -58, 'password': 'gretel'},
+        ]
+
+    def now_ms(self):
+        return self.clock.now_ms()
+
+    def pin_level(self, pin_id):
+        if pin_id == self.imu_int_pin and 0x68 in self.i2c_devices:
+            return self.i2c_devices[0x68].int1_level(self.clock.now)
+        now = self.now_ms()
+        for start, end, pid in self.presses:
+            if pid == pin_id and start <= now < end:
+                return 1 - self.pins.get(pin_id, 0)
+        return self.pins.get(pin_id, 0)
+
+    def press(self, pin_id, at_ms, duration_ms=100):
+        # invert the idle level of pin_id for duration_ms
+        self.presses.append((at_ms, at_ms + duration_ms, pin_id))
+
+    def fire_irq(self, pin_id):
+        if pin_id in self.irqs:
+            handler, pin = self.irqs[pin_id]
+            handler(pin)
+
+    def sleep(self, ms=None, step=0.02):
+        # lightsleep/deepsleep: the clock runs until a wake source triggers,
+        # ms have passed or the simulation is over
+        end = None if ms is None else self.clock.now + ms / 1000
+        if self.duration is not None and (end is None or end > self.duration):
+            end = self.duration
+        if end is None and not (self.wake_ext0 or self.wake_ext1):
+            raise RuntimeError('sleeping forever')
+        while end is None or self.clock.now < end:
+            if self._woken(self.wake_ext0):
+                self.wake_reason = 2  # machine.EXT0_WAKE
+                return
+            if self._woken(self.wake_ext1):
+                self.wake_reason = 3  # machine.EXT1_WAKE
+                return
+            self.clock.advance(step if end is None else min(step, end - self.clock.now))
+        self.wake_reason = 4  # machine.TIMER_WAKE
+
+    def _woken(self, source):
+        if source is None:
+            return False
+        pins, level = source
+        levels = [self.pin_level(p) for p in pins]
+        if level:
+            return any(levels)
+        return not any(levels)
+
+
+def install(imu=None, battery=None, duration=None, realtime=False, seed=1, flash_dir=None):
+    global world
+    if world is not None:
+        return world
+    clock = RealClock() if realtime or not CPYTHON else VirtualClock()
+    world = World(
+        clock,
+        imu if imu is not None else traces.SyntheticImu(seed),
+        battery if battery is not None else traces.SyntheticBattery(seed),
+        duration,
+    )
+    world.flash_dir = flash_dir or _ROOT + '/sim/flash'
+    paths = [_ROOT + '/sim/hw', _ROOT + '/lib', _ROOT]
+    if CPYTHON:
+        paths.insert(0, _ROOT + '/sim/port')
+    for path in reversed(paths):
+        if path in sys.path:
+            sys.path.remove(path)
+        sys.path.insert(0, path)
+    if CPYTHON:
+        _install_builtins()
+    import BMI160
+    world.i2c_devices[0x68] = BMI160.Registers()
+    return world
+
+
+def _install_builtins():
+    # main.py relies on names boot.py leaves behind on the device
+    import builtins
+    import gc
+    import traceback
+    import warnings
+
+    # primitives/__init__.py creates a coroutine just to get its type
+    warnings.filterwarnings('ignore', "coroutine '_g' was never awaited")
+    import machine
+    import micropython
+    import primitives
+
+    builtins.open = _flash_open(builtins.open)
+    builtins.const = micropython.const
+    builtins.machine = machine
+    builtins.micropython = micropython
+    builtins.gc = gc
+    sys.print_exception = lambda exc, file=None: traceback.print_exception(exc, file=file)
+    primitives.__getattr__ = _primitives_getattr
+
+
+def flash_path(path, mode='r'):
+    # files in the device root, like /uid.json, live in world.flash_dir;
+    # files that were only uploaded, like /stream.json, are read from src
+    if isinstance(path, str) and path.startswith('/') and path.rfind('/') == 0:
+        os.makedirs(world.flash_dir, exist_ok=True)
+        flash = world.flash_dir + path
+        if 'r' in mode and '+' not in mode and not os.path.exists(flash) and os.path.exists(_ROOT + path):
+            return _ROOT + path
+        return flash
+    return path
+
+
+def _flash_open(host_open):
+    def open(file, mode='r', *args, **kwargs):
+        return host_open(flash_path(file, mode), mode, *args, **kwargs)
+    return open
+
+
+def _primitives_getattr(attr):
+    # the package's lazy loader uses the MicroPython __import__ signature
+    import importlib
+    import primitives
+
+    mod = primitives._attrs.get(attr, None)
+    if mod is None:
+        raise AttributeError(attr)
+    value = getattr(importlib.import_module('primitives.' + mod), attr)
+    setattr(primitives, attr, value)
+    return value
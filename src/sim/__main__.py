@@ -0,0 +1,92 @@
+# Run main.py, or --app, against the simulated hardware, see sim/__init__.py
+
+import argparse
+import os
+import runpy
+import time
+
+import sim
+from sim import traces
+
+BUTTON_PIN = 39
+STRIP_PIN = 32
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m sim', description="run main.py on simulated hardware")
+    parser.add_argument('--duration', type=float, default=60, help='seconds of device time')
+    parser.add_argument('--imu', help='csv trace: t_ms,ax,ay,az,gx,gy,gz')
+    parser.add_argument('--vbat', help='csv trace: t_ms,vbat')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--realtime', action='store_true', help='wall clock instead of virtual time')
+    parser.add_argument('--press', type=float, action='append', default=[],
+                        help='press the button at this many seconds, repeatable')
+    parser.add_argument('--long-press', type=float, action='append', default=[],
+                        help='long-press the button at this many seconds, repeatable')
+    parser.add_argument('--log-level', default='INFO', help='DEBUG, INFO, WARNING, ERROR')
+    parser.add_argument('--app', default='main.py', help='script to run, e.g. gateway.py')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    world = sim.install(
+        imu=traces.CsvImu(args.imu) if args.imu else None,
+        battery=traces.CsvBattery(args.vbat) if args.vbat else None,
+        duration=args.duration,
+        realtime=args.realtime,
+        seed=args.seed,
+    )
+    # main.py uses sense=1, the button idles high
+    world.pins[BUTTON_PIN] = 1
+    for at in args.press:
+        world.press(BUTTON_PIN, int(at * 1000))
+    for at in args.long_press:
+        world.press(BUTTON_PIN, int(at * 1000), 1500)
+
+    import log
+    log.level = getattr(log, args.log_level.upper())
+
+    wall = time.monotonic()
+    while True:
+        try:
+            runpy.run_path(os.path.join(sim._ROOT, args.app), run_name='__main__')
+            break
+        except SystemExit as exc:
+            if str(exc) != 'deepsleep' or world.clock.now >= world.duration:
+                break
+            reboot(world)
+    wall = time.monotonic() - wall
+
+    device = world.clock.now
+    print('device time: %.1fs, wall time: %.2fs, speedup: %.0fx' % (
+        device, wall, device / wall if wall else 0))
+    print('strip writes: %d (%.1f/s)' % (
+        world.writes.get(STRIP_PIN, 0), world.writes.get(STRIP_PIN, 0) / device if device else 0))
+    if world.boots > 1:
+        print('boots: %d' % world.boots)
+
+
+def reboot(world):
+    # woken from deepsleep: what was running is gone, RTC memory and the
+    # sensors are not
+    import asyncio
+    import uasyncio
+
+    loop = uasyncio.get_event_loop()
+    tasks = asyncio.all_tasks(loop)
+    while tasks:
+        for task in tasks:
+            task.cancel()
+        try:
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        except SystemExit:
+            # the deepsleep again, from tasks that were waiting on its task
+            pass
+        tasks = asyncio.all_tasks(loop)
+    world.irqs.clear()
+    world.reset_cause = 4  # machine.DEEPSLEEP_RESET
+    world.boots += 1
+
+
+main()
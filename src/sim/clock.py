@@ -0,0 +1,73 @@
+# clock.py Time sources for the simulator
+
+import time
+
+try:
+    import asyncio
+    import selectors
+except ImportError:
+    asyncio = None
+
+TICKS_PERIOD = 1 << 30  # same wrap as MicroPython's ticks_ms/ticks_us
+
+
+class RealClock:
+    def __init__(self):
+        self._start = self._wall()
+
+    @staticmethod
+    def _wall():
+        if hasattr(time, 'ticks_us'):
+            return time.ticks_us() / 1000000
+        return time.monotonic()
+
+    @property
+    def now(self):
+        return self._wall() - self._start
+
+    def now_ms(self):
+        return int(self.now * 1000)
+
+    def advance(self, seconds):
+        time.sleep(seconds)
+
+    def new_event_loop(self):
+        return asyncio.new_event_loop()
+
+
+class VirtualClock:
+    # only moves when the event loop would otherwise wait, or on advance()
+    def __init__(self):
+        self.now = 0.0
+
+    def now_ms(self):
+        return int(self.now * 1000)
+
+    def advance(self, seconds):
+        if seconds > 0:
+            self.now += seconds
+
+    def new_event_loop(self):
+        return _VirtualEventLoop(self)
+
+
+if asyncio is not None:
+    class _VirtualSelector(selectors.DefaultSelector):
+        def __init__(self, clock):
+            super().__init__()
+            self._clock = clock
+
+        def select(self, timeout=None):
+            ready = super().select(0)
+            if not ready and timeout:
+                # nothing to do until the next timer, jump there
+                self._clock.advance(timeout)
+            return ready
+
+    class _VirtualEventLoop(asyncio.SelectorEventLoop):
+        def __init__(self, clock):
+            self._clock = clock
+            super().__init__(_VirtualSelector(clock))
+
+        def time(self):
+            return self._clock.now
@@ -0,0 +1,159 @@
+# BMI160.py Simulator stand-in for the BMI160 driver, reads sim.world.imu
+
+import struct
+
+import sim
+
+
+class BMI160_I2C:
+    def __init__(self, i2c, addr=0x68):
+        self.i2c = i2c
+        self.addr = addr
+        self.zero_motion_duration = 1
+        self.zero_motion_enabled = False
+
+    def __getattr__(self, name):
+        # rate, range and threshold setters are accepted and ignored
+        if name.startswith('set'):
+            return lambda *args: None
+        raise AttributeError(name)
+
+    def _sample(self):
+        return sim.world.imu.sample(sim.world.clock.now)
+
+    def setZeroMotionDetectionDuration(self, duration):
+        self.zero_motion_duration = duration
+
+    def setIntZeroMotionEnabled(self, enabled):
+        self.zero_motion_enabled = enabled
+
+    def getTemperature(self):
+        return 27.5
+
+    def getAcceleration(self):
+        return self._sample()[0:3]
+
+    def getRotation(self):
+        return self._sample()[3:6]
+
+    def getMotion6(self):
+        return self._sample()
+
+    def getIntZeroMotionStatus(self):
+        if not self.zero_motion_enabled:
+            return False
+        return sim.world.imu.still_for(sim.world.clock.now) >= self.zero_motion_duration
+
+
+class Registers:
+    # I2C register model of the parts of the BMI160 that lib/imu.py uses:
+    # data registers, interrupt status, FIFO, the watermark interrupt and
+    # any-motion on the INT1 level
+    ODR = 50  # Hz, set_accel_rate(7) in main.py
+
+    def __init__(self):
+        self.regs = bytearray(128)
+        self.regs[0x00] = 0xD1  # CHIP_ID
+        self.odr = self.ODR
+        self._fifo_from = 0.0  # device time of the oldest frame in the FIFO
+        self._irq_handle = None
+        self._any_motion = False  # latched
+
+    def _now(self):
+        return sim.world.clock.now
+
+    def _fifo_frames(self, now):
+        if not self.regs[0x47] & 0xC0:
+            return 0
+        frames = int((now - self._fifo_from) * self.odr + 1e-6)
+        if frames > 1024 // 12:
+            # full, the oldest frames get dropped
+            frames = 1024 // 12
+            self._fifo_from = now - frames / self.odr
+        return frames
+
+    def _watermark(self):
+        return max(1, self.regs[0x46] * 4 // 12)
+
+    def _data(self, now):
+        # registers 0x0C..0x1B: gyro, accel, sensortime, status
+        ax, ay, az, gx, gy, gz = sim.world.imu.sample(now)
+        data = struct.pack('<6h', _i16(gx), _i16(gy), _i16(gz), _i16(ax), _i16(ay), _i16(az))
+        sensortime = int(now * 1000000 / 39) & 0xFFFFFF
+        return data + struct.pack('<I', sensortime)[:3] + bytes((0xC0,))
+
+    def _int_status(self, now):
+        # registers 0x1C..0x23: int status 0..3, temperature, fifo length
+        frames = self._fifo_frames(now)
+        still = sim.world.imu.still_for(now) >= 1
+        status0 = 0 if still else 0x04
+        status1 = (0x80 if still else 0) | (0x40 if frames >= self._watermark() else 0)
+        return bytes((status0, status1, 0, 0, 0, 0)) + struct.pack('<H', frames * 12)
+
+    def read(self, memaddr, buf):
+        now = self._now()
+        out = memoryview(buf).cast('B')
+        if memaddr == 0x24:
+            self._read_fifo(now, out)
+            return
+        data = status = None
+        for i in range(len(out)):
+            reg = memaddr + i
+            if 0x0C <= reg <= 0x1B:
+                if data is None:
+                    data = self._data(now)
+                out[i] = data[reg - 0x0C]
+            elif 0x1C <= reg <= 0x23:
+                if status is None:
+                    status = self._int_status(now)
+                out[i] = status[reg - 0x1C]
+            else:
+                out[i] = self.regs[reg & 0x7F]
+
+    def _read_fifo(self, now, out):
+        frames = min(self._fifo_frames(now), len(out) // 12)
+        pos = 0
+        for k in range(frames):
+            out[pos:pos + 12] = self._data(self._fifo_from + k / self.odr)[:12]
+            pos += 12
+        for i in range(pos, len(out)):
+            out[i] = 0x80  # over-read pattern
+        self._fifo_from += frames / self.odr
+        self._schedule_irq()
+
+    def int1_level(self, now):
+        if not (self.regs[0x50] & 0x07 and self.regs[0x55] & 0x04):
+            return 0
+        if sim.world.imu.still_for(now) == 0:
+            # held until int_rst in latched mode
+            self._any_motion = bool(self.regs[0x54] & 0x0F)
+            return 1
+        return 1 if self._any_motion else 0
+
+    def write(self, memaddr, buf):
+        for i, val in enumerate(bytes(buf)):
+            reg = memaddr + i
+            self.regs[reg] = val
+            if reg == 0x7E and val == 0xB1:
+                self._any_motion = False  # int_reset, the only way out of the latch
+            if reg == 0x7E and val == 0xB0 or reg == 0x47:
+                self._fifo_from = self._now()  # flush
+            elif reg == 0x40:
+                self.odr = 100 * 2 ** ((val & 0x0F) - 8)
+        self._schedule_irq()
+
+    def _schedule_irq(self):
+        import uasyncio
+
+        if self._irq_handle is not None:
+            self._irq_handle.cancel()
+            self._irq_handle = None
+        if not (self.regs[0x51] & 0x40 and self.regs[0x56] & 0x40 and self.regs[0x47] & 0xC0):
+            return
+        at = self._fifo_from + self._watermark() / self.odr
+        self._irq_handle = uasyncio.get_event_loop().call_later(
+            max(0, at - self._now()), sim.world.fire_irq, sim.world.imu_int_pin)
+
+
+def _i16(val):
+    return max(-32768, min(32767, int(val)))
@@ -0,0 +1,13 @@
+# aioprof.py Simulator stand-in for the uasyncio task profiler
+
+
+def enable():
+    pass
+
+
+def reset():
+    pass
+
+
+def report():
+    pass
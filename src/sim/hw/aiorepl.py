@@ -0,0 +1,8 @@
+# aiorepl.py Simulator stand-in, there is no serial console to serve
+
+import uasyncio as asyncio
+
+
+async def task(g=None, prompt='--> '):
+    while True:
+        await asyncio.sleep(3600)
@@ -0,0 +1,14 @@
+# esp32.py Simulator stand-in for the esp32 module, wake sources only
+
+import sim
+
+WAKEUP_ALL_LOW = False
+WAKEUP_ANY_HIGH = True
+
+
+def wake_on_ext0(pin, level):
+    sim.world.wake_ext0 = None if pin is None else ((pin.id,), level)
+
+
+def wake_on_ext1(pins, level):
+    sim.world.wake_ext1 = (tuple(p.id for p in pins), level) if pins else None
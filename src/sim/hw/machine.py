@@ -0,0 +1,176 @@
+# machine.py Simulator stand-in for the ESP32 machine module
+
+import sim
+
+PWRON_RESET = 1
+HARD_RESET = 2
+WDT_RESET = 3
+DEEPSLEEP_RESET = 4
+SOFT_RESET = 5
+
+EXT0_WAKE = PIN_WAKE = 2
+EXT1_WAKE = 3
+TIMER_WAKE = 4
+
+_UID = bytes((0x24, 0x0A, 0xC4, 0x5D, 0x09, 0x17))
+_freq = 160000000
+
+
+def unique_id():
+    return _UID
+
+
+def reset_cause():
+    return sim.world.reset_cause
+
+
+def wake_reason():
+    return sim.world.wake_reason
+
+
+def freq(hz=None):
+    global _freq
+    if hz is None:
+        return _freq
+    _freq = hz
+
+
+def idle():
+    pass
+
+
+def disable_irq():
+    return 0
+
+
+def enable_irq(state=0):
+    pass
+
+
+def lightsleep(ms=None):
+    sim.world.sleep(ms)
+
+
+def deepsleep(ms=None):
+    # python -m sim boots main.py again, like the reset on wake
+    sim.world.sleep(ms)
+    raise SystemExit('deepsleep')
+
+
+class Pin:
+    IN = 1
+    OUT = 3
+    OPEN_DRAIN = 7
+    PULL_UP = 2
+    PULL_DOWN = 1
+    IRQ_RISING = 1
+    IRQ_FALLING = 2
+    WAKE_LOW = 4
+    WAKE_HIGH = 5
+
+    def __init__(self, id, mode=-1, pull=-1, value=None):
+        self.id = id
+        self.init(mode, pull, value)
+
+    def init(self, mode=-1, pull=-1, value=None):
+        if value is not None:
+            sim.world.pins[self.id] = value
+
+    def value(self, v=None):
+        if v is None:
+            return sim.world.pin_level(self.id)
+        sim.world.pins[self.id] = 1 if v else 0
+
+    __call__ = value
+
+    def on(self):
+        self.value(1)
+
+    def off(self):
+        self.value(0)
+
+    def irq(self, handler=None, trigger=IRQ_RISING | IRQ_FALLING, wake=None):
+        if handler is None:
+            sim.world.irqs.pop(self.id, None)
+        else:
+            sim.world.irqs[self.id] = (handler, self)
+
+    def __repr__(self):
+        return 'Pin(%d)' % self.id
+
+
+class ADC:
+    ATTN_0DB = 0
+    ATTN_2_5DB = 1
+    ATTN_6DB = 2
+    ATTN_11DB = 3
+    WIDTH_12BIT = 3
+
+    # VBAT_CORR in main.py, the cell is behind a divider
+    DIVIDER = 2.18
+
+    def __init__(self, pin, atten=None):
+        self.pin = pin
+
+    def atten(self, atten):
+        pass
+
+    def width(self, width):
+        pass
+
+    def _pin_volts(self):
+        return sim.world.battery.volts(sim.world.clock.now) / self.DIVIDER
+
+    def read(self):
+        return max(0, min(4095, int(self._pin_volts() / 3.3 * 4095)))
+
+    def read_u16(self):
+        return self.read() << 4
+
+    def read_uv(self):
+        return int(self._pin_volts() * 1000000)
+
+
+class SoftI2C:
+    def __init__(self, id=-1, *, scl=None, sda=None, freq=400000, timeout=50000):
+        self.scl = scl
+        self.sda = sda
+        self.freq = freq
+
+    def scan(self):
+        return sorted(sim.world.i2c_devices)
+
+    def _device(self, addr):
+        dev = sim.world.i2c_devices.get(addr)
+        if dev is None:
+            raise OSError(19)  # ENODEV
+        return dev
+
+    def readfrom_mem(self, addr, memaddr, nbytes, *, addrsize=8):
+        buf = bytearray(nbytes)
+        self.readfrom_mem_into(addr, memaddr, buf)
+        return bytes(buf)
+
+    def readfrom_mem_into(self, addr, memaddr, buf, *, addrsize=8):
+        self._device(addr).read(memaddr, buf)
+
+    def writeto_mem(self, addr, memaddr, buf, *, addrsize=8):
+        self._device(addr).write(memaddr, buf)
+
+    def __repr__(self):
+        return '%s(scl=%r, sda=%r, freq=%d)' % (type(self).__name__, self.scl, self.sda, self.freq)
+
+
+class I2C(SoftI2C):
+    def __init__(self, id=0, *, scl=None, sda=None, freq=400000, timeout=50000):
+        super().__init__(scl=scl, sda=sda, freq=freq)
+        self.id = id
+
+
+class RTC:
+    _memory = b''
+
+    def memory(self, data=None):
+        if data is None:
+            return RTC._memory
+        RTC._memory = bytes(data)
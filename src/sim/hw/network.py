@@ -0,0 +1,109 @@
+# network.py Simulator stand-in for the ESP32 network module, WLAN only
+
+# The station sees the access points in sim.world.networks. connect() takes
+# CONNECT_MS of device time, less with a BSSID since the ESP32 then skips
+# its own channel sweep; scan() blocks for SCAN_MS like the real one does.
+
+import machine
+import sim
+
+STA_IF = 0
+AP_IF = 1
+
+STAT_IDLE = 1000
+STAT_CONNECTING = 1001
+STAT_GOT_IP = 1010
+STAT_BEACON_TIMEOUT = 200
+STAT_NO_AP_FOUND = 201
+STAT_WRONG_PASSWORD = 202
+STAT_ASSOC_FAIL = 203
+STAT_HANDSHAKE_TIMEOUT = 204
+
+SCAN_MS = 2000
+CONNECT_MS = 2500
+CONNECT_BSSID_MS = 600
+
+_interfaces = {}
+
+
+def WLAN(interface=STA_IF):
+    # one object per interface, like on the device
+    if interface not in _interfaces:
+        _interfaces[interface] = _WLAN(interface)
+    return _interfaces[interface]
+
+
+class _WLAN:
+    def __init__(self, interface):
+        self.interface = interface
+        self._active = False
+        self._status = STAT_IDLE
+        self._ready_ms = None
+        self._ap = None
+        self._config = {}
+
+    def active(self, on=None):
+        if on is None:
+            return self._active
+        self._active = bool(on)
+        if not on:
+            self._ap = None
+            self._status = STAT_IDLE
+
+    def scan(self):
+        if not self._active:
+            raise OSError('STA must be active')
+        sim.world.clock.advance(SCAN_MS / 1000)
+        return [(n['ssid'].encode(), n['bssid'], n['channel'], n['rssi'], 3, False)
+                for n in sim.world.networks]
+
+    def connect(self, ssid, key=None, bssid=None):
+        if not self._active:
+            raise OSError('STA must be active')
+        self._ap = None
+        self._status = STAT_NO_AP_FOUND
+        for n in sim.world.networks:
+            if n['ssid'] == ssid and (bssid is None or n['bssid'] == bssid):
+                if n.get('password') != key:
+                    self._status = STAT_WRONG_PASSWORD
+                    return
+                self._ap = n
+                self._status = STAT_CONNECTING
+                delay = CONNECT_BSSID_MS if bssid else CONNECT_MS
+                self._ready_ms = sim.world.now_ms() + delay
+                return
+
+    def disconnect(self):
+        if not self._active:
+            raise OSError('Wifi Not Started')  # as the ESP32 port
+        self._ap = None
+        self._status = STAT_IDLE
+
+    def status(self, param=None):
+        if param == 'rssi':
+            return self._ap['rssi'] if self.isconnected() else 0
+        if self._status == STAT_CONNECTING:
+            if self._ap not in sim.world.networks:
+                self._status = STAT_NO_AP_FOUND
+            elif sim.world.now_ms() >= self._ready_ms:
+                self._status = STAT_GOT_IP
+        elif self._status == STAT_GOT_IP and self._ap not in sim.world.networks:
+            self._status = STAT_BEACON_TIMEOUT  # went out of range
+        return self._status
+
+    def isconnected(self):
+        return self.status() == STAT_GOT_IP
+
+    def ifconfig(self):
+        if self.interface == AP_IF:
+            return ('192.168.4.1', '255.255.255.0', '192.168.4.1', '0.0.0.0')
+        if not self.isconnected():
+            return ('0.0.0.0', '0.0.0.0', '0.0.0.0', '0.0.0.0')
+        return ('10.23.0.42', '255.255.255.0', '10.23.0.1', '10.23.0.1')
+
+    def config(self, *args, **kwargs):
+        if args:
+            if args[0] == 'mac':
+                return machine.unique_id()
+            return self._config.get(args[0])
+        self._config.update(kwargs)
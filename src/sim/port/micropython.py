@@ -0,0 +1,24 @@
+# micropython.py Simulator stand-in for the micropython module on CPython
+
+# viper/native are deliberately missing, code that wants them has to fall
+# back the same way it does on ports without the emitters.
+
+
+def const(expr):
+    return expr
+
+
+def mem_info(verbose=None):
+    pass
+
+
+def alloc_emergency_exception_buf(size):
+    pass
+
+
+def opt_level(level=None):
+    return 0
+
+
+def schedule(func, arg):
+    func(arg)
@@ -0,0 +1,65 @@
+# uasyncio.py Simulator stand-in for uasyncio on top of CPython asyncio
+
+# There is a single loop for the whole run, created up front, because
+# MicroPython code creates tasks at import time before run() is called.
+
+import asyncio
+from asyncio import (CancelledError, Event, Lock, TimeoutError, current_task,
+                     gather, sleep, wait_for)
+
+import sim
+
+_loop = None
+
+
+def get_event_loop():
+    global _loop
+    if _loop is None:
+        _loop = sim.world.clock.new_event_loop()
+        asyncio.set_event_loop(_loop)
+    return _loop
+
+
+def new_event_loop():
+    # MicroPython resets its loop state here, the simulator keeps its loop
+    return get_event_loop()
+
+
+def create_task(coro):
+    return get_event_loop().create_task(coro)
+
+
+async def sleep_ms(ms):
+    await asyncio.sleep(ms / 1000)
+
+
+async def wait_for_ms(aw, timeout):
+    return await asyncio.wait_for(aw, timeout / 1000)
+
+
+class ThreadSafeFlag:
+    # set() may come from an interrupt handler, wait() clears the flag
+    def __init__(self):
+        self._event = Event()
+
+    def set(self):
+        self._event.set()
+
+    def clear(self):
+        self._event.clear()
+
+    async def wait(self):
+        await self._event.wait()
+        self._event.clear()
+
+
+def run(coro):
+    # returns when coro does or when the simulated duration is over
+    loop = get_event_loop()
+    task = loop.create_task(coro)
+    if sim.world.duration is not None:
+        loop.call_later(sim.world.duration - sim.world.clock.now, task.cancel)
+    try:
+        return loop.run_until_complete(task)
+    except CancelledError:
+        return None
@@ -0,0 +1,42 @@
+# utime.py Simulator stand-in for utime, reads the simulator clock
+
+import sim
+from sim.clock import TICKS_PERIOD
+
+_HALF = TICKS_PERIOD // 2
+
+
+def ticks_ms():
+    return int(sim.world.clock.now * 1000) % TICKS_PERIOD
+
+
+def ticks_us():
+    return int(sim.world.clock.now * 1000000) % TICKS_PERIOD
+
+
+def ticks_cpu():
+    return ticks_us()
+
+
+def ticks_add(ticks, delta):
+    return (ticks + delta) % TICKS_PERIOD
+
+
+def ticks_diff(ticks1, ticks2):
+    return ((ticks1 - ticks2 + _HALF) % TICKS_PERIOD) - _HALF
+
+
+def time():
+    return int(sim.world.clock.now)
+
+
+def sleep(seconds):
+    sim.world.clock.advance(seconds)
+
+
+def sleep_ms(ms):
+    sim.world.clock.advance(ms / 1000)
+
+
+def sleep_us(us):
+    sim.world.clock.advance(us / 1000000)
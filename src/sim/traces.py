@@ -0,0 +1,138 @@
+# traces.py IMU and battery signals for the simulator
+
+# Samples are raw sensor units as the BMI160 driver returns them with the
+# ranges main.py configures: accel +-4g (8192 LSB/g), gyro +-250 deg/s
+# (131 LSB/deg/s). Battery values are volts at the cell.
+
+import math
+import random
+
+ACCEL_LSB_G = 8192
+GYRO_LSB_DPS = 131
+
+# (seconds, step frequency Hz, vertical accel amplitude g, gyro amplitude deg/s)
+ACTIVITY = (
+    (20, 0.0, 0.0, 0),  # resting
+    (30, 1.8, 0.3, 30),  # walk
+    (20, 2.6, 0.6, 70),  # trot
+    (15, 3.4, 1.1, 140),  # run
+    (15, 0.0, 0.0, 0),  # resting
+)
+
+
+class SyntheticImu:
+    def __init__(self, seed=1, activity=ACTIVITY, noise=20):
+        self.activity = activity
+        self.period = sum(a[0] for a in activity)
+        self.noise = noise
+        self._rand = random.Random(seed)
+
+    def _locate(self, t):
+        # (seconds into segment, segment index) at device time t seconds
+        t %= self.period
+        for i, seg in enumerate(self.activity):
+            if t < seg[0]:
+                return t, i
+            t -= seg[0]
+        return 0, len(self.activity) - 1
+
+    def segment(self, t):
+        # (seconds into segment, segment) at device time t seconds
+        offset, i = self._locate(t)
+        return offset, self.activity[i]
+
+    def still_for(self, t):
+        # seconds the collar has been resting at time t, 0 while moving,
+        # resting segments in a row count as one, also across the wrap
+        offset, i = self._locate(t)
+        if self.activity[i][1] != 0:
+            return 0
+        still = offset
+        for _ in range(len(self.activity) - 1):
+            i -= 1
+            if self.activity[i][1] != 0 or still >= t:
+                break
+            still += self.activity[i][0]
+        return min(still, t)
+
+    def sample(self, t):
+        # (ax, ay, az, gx, gy, gz)
+        offset, (_, freq, accel, gyro) = self.segment(t)
+        n = self.noise
+        rnd = self._rand.randint
+        w = 2 * math.pi * freq * offset
+        s = math.sin(w)
+        c = math.cos(w)
+        return (
+            int(0.15 * accel * c * ACCEL_LSB_G) + rnd(-n, n),
+            int(0.1 * accel * s * ACCEL_LSB_G) + rnd(-n, n),
+            int((1 + accel * s) * ACCEL_LSB_G) + rnd(-n, n),
+            int(0.3 * gyro * c * GYRO_LSB_DPS) + rnd(-n, n),
+            int(gyro * s * GYRO_LSB_DPS) + rnd(-n, n),
+            int(0.2 * gyro * math.sin(w / 2) * GYRO_LSB_DPS) + rnd(-n, n),
+        )
+
+
+class SyntheticBattery:
+    def __init__(self, seed=1, start=4.15, drain_per_hour=0.3, noise=0.01):
+        self.start = start
+        self.drain_per_hour = drain_per_hour
+        self.noise = noise
+        self._rand = random.Random(seed)
+
+    def volts(self, t):
+        v = self.start - self.drain_per_hour * t / 3600
+        return max(0.0, v + self._rand.uniform(-self.noise, self.noise))
+
+
+class CsvTrace:
+    # first column is t_ms, the rest as described in the header row, the
+    # trace repeats once it runs out and values hold between rows
+    def __init__(self, path):
+        self.times = []
+        self.rows = []
+        with open(path) as f:
+            self.columns = f.readline().strip().split(',')[1:]
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                fields = line.split(',')
+                self.times.append(int(fields[0]))
+                self.rows.append(tuple(float(x) for x in fields[1:]))
+        self.period = self.times[-1] + 1 if self.times else 1
+        self._i = 0
+
+    def row(self, t):
+        ms = int(t * 1000) % self.period
+        i = self._i
+        if i >= len(self.times) or self.times[i] > ms:
+            i = 0
+        while i + 1 < len(self.times) and self.times[i + 1] <= ms:
+            i += 1
+        self._i = i
+        return self.rows[i]
+
+
+class CsvImu(CsvTrace):
+    # columns: t_ms,ax,ay,az,gx,gy,gz
+    def __init__(self, path, still_threshold=2 * GYRO_LSB_DPS):
+        super().__init__(path)
+        self.still_threshold = still_threshold
+        self._moved = 0.0
+
+    def sample(self, t):
+        return tuple(int(x) for x in self.row(t))
+
+    def still_for(self, t):
+        gyro = self.row(t)[3:6]
+        if sum(abs(x) for x in gyro) > self.still_threshold:
+            self._moved = t
+            return 0
+        return t - self._moved
+
+
+class CsvBattery(CsvTrace):
+    # columns: t_ms,vbat
+    def volts(self, t):
+        return self.row(t)[0]
@@ -0,0 +1,14 @@
+# conftest.py Host tests for the modules in src/lib
+
+# The modules are written for MicroPython; the simulator provides the
+# MicroPython modules on CPython, as for bench.py.
+
+import os
+import sys
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+sys.path.insert(0, SRC)
+
+import sim  # noqa: E402
+
+sim.install()
@@ -0,0 +1,69 @@
+# test_fancyfixed.py fancyfixed against fancyled's float path
+
+# Both sides end in 8 bit channels; the fixed path may be off by up to
+# TOLERANCE per channel on seeded random colors, weights and positions.
+
+import random
+
+import fancyfixed
+import fancyled as fancy
+
+TOLERANCE = 2  # LSB per 8 bit channel
+CASES = 5000
+
+
+def assert_close(fixed, ref):
+    for shift in (16, 8, 0):
+        a = (fixed >> shift) & 0xFF
+        b = (ref >> shift) & 0xFF
+        assert abs(a - b) <= TOLERANCE, '%06x vs %06x' % (fixed, ref)
+
+
+def test_mix():
+    rnd = random.Random(5)
+    for _ in range(CASES):
+        c1, c2, w = rnd.getrandbits(24), rnd.getrandbits(24), rnd.getrandbits(8)
+        assert_close(fancyfixed.mix(c1, c2, w), fancy.mix(c1, c2, w / 256).pack())
+
+
+def test_mix_ends():
+    assert fancyfixed.mix(0x102030, 0xA0B0C0, 0) == 0x102030
+    assert fancyfixed.mix(0x102030, 0xA0B0C0, fancyfixed.ONE) == 0xA0B0C0
+
+
+def test_gamma_adjust():
+    rnd = random.Random(6)
+    for _ in range(CASES):
+        c, b = rnd.getrandbits(24), rnd.getrandbits(8) + 1
+        ref = fancy.gamma_adjust(fancy.unpack(c), brightness=b / 256).pack()
+        assert_close(fancyfixed.gamma_adjust(c, brightness=b), ref)
+
+
+def test_gamma_adjust_list():
+    colors = [0x000000, 0x808080, 0xFFFFFF]
+    assert fancyfixed.gamma_adjust(colors) == [fancyfixed.gamma_adjust(c) for c in colors]
+    fancyfixed.gamma_adjust(colors, inplace=True)
+    assert colors == [fancyfixed.gamma_adjust(c) for c in (0x000000, 0x808080, 0xFFFFFF)]
+
+
+def test_palette_lookup():
+    rnd = random.Random(7)
+    for _ in range(CASES // 16):
+        palette = [rnd.getrandbits(24) for _ in range(rnd.randint(2, 16))]
+        for _ in range(16):
+            pos = rnd.getrandbits(16)
+            assert_close(fancyfixed.palette_lookup(palette, pos),
+                         fancy.palette_lookup(palette, pos / 65536).pack())
+
+
+def test_expand_gradient():
+    rnd = random.Random(8)
+    for _ in range(CASES // 64):
+        stops = sorted(rnd.getrandbits(16) for _ in range(rnd.randint(2, 5)))
+        stops[0], stops[-1] = 0, fancyfixed.POS_ONE
+        gradient = [(p, rnd.getrandbits(24)) for p in stops]
+        fixed = fancyfixed.expand_gradient(gradient, 64)
+        ref = fancy.expand_gradient([(p / 65536, c) for p, c in gradient], 64)
+        assert len(fixed) == 64
+        for a, b in zip(fixed, ref):
+            assert_close(a, b if isinstance(b, int) else b.pack())
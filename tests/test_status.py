@@ -0,0 +1,101 @@
+# test_status.py Transitions of the status state machine
+
+from status import Status, NORMAL, LOW, CRITICAL, CHARGING, FULL, SLEEPING
+
+
+def started():
+    status = Status()
+    status.start()
+    return status
+
+
+def test_starts_normal():
+    status = started()
+    assert status.name == NORMAL
+    assert not status.low_power
+
+
+def test_sleep_wake():
+    status = started()
+    status.sleep()
+    assert status.name == SLEEPING
+    assert status.low_power
+    status.wake()
+    assert status.name == NORMAL
+
+
+def test_manual_low():
+    status = started()
+    status.button()
+    assert status.name == LOW
+    assert status.manual_low
+    assert status.low_power
+    status.button()
+    assert status.name == NORMAL
+    assert not status.manual_low
+
+
+def test_manual_low_survives_sleep():
+    status = started()
+    status.button()
+    status.sleep()
+    assert status.name == SLEEPING
+    status.wake()
+    assert status.name == LOW
+    assert status.manual_low
+
+
+def test_battery_levels():
+    status = started()
+    status.battery(120, False, True)
+    assert status.name == LOW
+    status.battery(30, False, True)
+    assert status.name == CRITICAL
+    status.battery(80, False, True)
+    assert status.name == CRITICAL  # hysteresis
+    status.battery(600, False, True)
+    assert status.name == NORMAL
+    status.battery(600, True, True)
+    assert status.name == CHARGING
+    status.battery(990, True, True)
+    assert status.name == FULL
+
+
+def test_low_battery_survives_sleep():
+    status = started()
+    status.battery(120, False, True)
+    status.sleep()
+    status.wake()
+    assert status.name == LOW
+    assert not status.manual_low
+
+
+def test_battery_overrides_manual_low():
+    status = started()
+    status.button()
+    status.battery(30, False, True)
+    assert status.name == CRITICAL
+    assert not status.manual_low
+    status.battery(600, False, True)
+    assert status.name == NORMAL
+    status.sleep()
+    status.wake()
+    assert status.name == NORMAL
+
+
+def test_button_ignored_while_charging():
+    status = started()
+    status.battery(600, True, True)
+    status.button()
+    assert status.name == CHARGING
+    assert not status.manual_low
+
+
+def test_on_change():
+    seen = []
+    status = Status()
+    status.start(lambda s: seen.append(s.name))
+    status.button()
+    status.sleep()
+    status.wake()
+    assert seen == [NORMAL, LOW, SLEEPING, NORMAL, LOW]